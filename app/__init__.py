@@ -2,18 +2,44 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from config import Config  # Ensure this line matches the file name 'config.py'
+from app.replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
-def create_app():
+def create_app(config_class=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
 
     db.init_app(app)
     migrate.init_app(app, db)
 
     from app import routes, models
+    from app.card_import import import_cards_command
+    from app.catalog_cache import catalog_cache
+    from app.decks import decks
+    from app.events import session_events
+    from app.history_export import export_history_command
+    from app.jobs import jobs
+    from app.leaderboard import leaderboards
+    from app.metrics import metrics
+    from app.replicas import replicas
+    from app.shards import init_shards_command, shards
+    from app.snapshots import snapshots
+    from app.submissions import submission_batcher
+    metrics.init_app(app)
+    replicas.init_app(app)
+    shards.init_app(app)
+    catalog_cache.init_app(app)
+    decks.init_app(app)
+    jobs.init_app(app)
+    leaderboards.init_app(app)
+    session_events.init_app(app)
+    snapshots.init_app(app)
+    submission_batcher.init_app(app)
     app.register_blueprint(routes.bp)
+    app.cli.add_command(import_cards_command)
+    app.cli.add_command(export_history_command)
+    app.cli.add_command(init_shards_command)
 
-    return app
\ No newline at end of file
+    return app
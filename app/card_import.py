@@ -0,0 +1,204 @@
+import csv
+import io
+import json
+
+import click
+from flask import current_app
+
+from app import db
+from app.models import BonusCard, ChallengeCard, MaterialCard
+
+
+# For each catalog: its model, and its importable fields as
+# (name, type, required, max length)
+CATALOGS = {
+    'material': (MaterialCard, (
+        ('name', str, True, 128),
+        ('properties', str, True, None),
+        ('uses', str, True, None),
+    )),
+    'challenge': (ChallengeCard, (
+        ('title', str, True, 128),
+        ('description', str, True, None),
+        ('key_considerations', str, False, None),
+        ('bonus_points', int, False, None),
+    )),
+    'bonus': (BonusCard, (
+        ('name', str, True, 128),
+        ('effect', str, True, None),
+        ('scoring_rules', str, True, None),
+    )),
+}
+
+FORMATS = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv',
+}
+
+
+class ImportAborted(Exception):
+    # The input could not be read to the end. `summary` covers the rows
+    # read before that, whose batches are committed.
+
+    def __init__(self, message, summary):
+        super().__init__(message)
+        self.summary = summary
+
+
+def read_rows(stream, fmt, max_field_size=None):
+    # Yield (line number, row) from a text stream one record at a time. A
+    # row is a dict, or an error message when the record can't be parsed.
+    # CSV fields may be up to max_field_size characters, since card texts
+    # are unbounded; csv's own limit is 128 KiB.
+    if fmt == 'ndjson':
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, f'Invalid JSON: {e}'
+                continue
+            yield line_number, row if isinstance(row, dict) else 'Each line must be a JSON object'
+    elif fmt == 'csv':
+        if max_field_size is not None and max_field_size > csv.field_size_limit():
+            csv.field_size_limit(max_field_size)
+        reader = csv.DictReader(stream)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # The reader carries on with the next line
+                yield reader.line_num + 1, f'Invalid CSV: {e}'
+                continue
+            yield reader.line_num, row
+    else:
+        raise ValueError(f'Unsupported import format: {fmt}')
+
+
+def validate_row(fields, row):
+    # The row's values for the model's columns, or raise ValueError
+    values = {}
+    for name, kind, required, max_length in fields:
+        value = row.get(name)
+        if value is None or value == '':
+            if required:
+                raise ValueError(f'{name} is required')
+            values[name] = None
+            continue
+        if kind is int:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f'{name} must be an integer')
+        elif not isinstance(value, str):
+            raise ValueError(f'{name} must be a string')
+        elif max_length is not None and len(value) > max_length:
+            raise ValueError(f'{name} must be at most {max_length} characters')
+        values[name] = value
+    return values
+
+
+def copy_rows(model, columns, rows):
+    # Load a batch with COPY ... FROM STDIN in the session's transaction
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # None is written as an unquoted empty field, which COPY reads as NULL
+        writer.writerow([row[column] for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY {model.__tablename__} ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer
+        )
+    finally:
+        cursor.close()
+
+
+def insert_batch(model, columns, rows):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        copy_rows(model, columns, rows)
+    else:
+        db.session.execute(db.insert(model), rows)
+    db.session.commit()
+
+
+def import_cards(catalog, stream, fmt, batch_size=None, max_errors=None):
+    # Validate and insert cards from a text stream, committing every
+    # batch_size valid rows, so memory use doesn't grow with the input.
+    # Invalid rows are skipped; the first max_errors of them are reported.
+    model, fields = CATALOGS[catalog]
+    columns = [name for name, _, _, _ in fields]
+    batch_size = batch_size or current_app.config['CARD_IMPORT_BATCH_SIZE']
+    max_errors = max_errors if max_errors is not None else current_app.config['CARD_IMPORT_MAX_ERRORS']
+    max_field_size = current_app.config['CARD_IMPORT_MAX_FIELD_SIZE']
+    summary = {'inserted': 0, 'failed': 0, 'errors': []}
+
+    def fail(line_number, error, count=1):
+        summary['failed'] += count
+        if len(summary['errors']) < max_errors:
+            summary['errors'].append({'line': line_number, 'error': error})
+
+    def flush(batch):
+        try:
+            insert_batch(model, columns, [row for _, row in batch])
+        except Exception as e:
+            db.session.rollback()
+            fail(batch[0][0], f'Batch of {len(batch)} rows starting here was not inserted: {e}', len(batch))
+        else:
+            summary['inserted'] += len(batch)
+
+    batch = []
+    rows = read_rows(stream, fmt, max_field_size)
+    try:
+        for line_number, row in rows:
+            if isinstance(row, str):
+                fail(line_number, row)
+                continue
+            try:
+                batch.append((line_number, validate_row(fields, row)))
+            except ValueError as e:
+                fail(line_number, str(e))
+                continue
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+    except UnicodeDecodeError as e:
+        # The rows read so far are complete, so they are still inserted
+        if batch:
+            flush(batch)
+        raise ImportAborted(f'Input is not valid UTF-8: {e}', summary)
+    if batch:
+        flush(batch)
+    return summary
+
+
+@click.command('import-cards')
+@click.argument('catalog', type=click.Choice(sorted(CATALOGS)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']),
+              help='Input format; guessed from the file extension by default.')
+@click.option('--batch-size', type=int, help='Rows inserted per batch and commit.')
+def import_cards_command(catalog, source, fmt, batch_size):
+    """Import cards into a catalog from an NDJSON or CSV file ('-' for stdin)."""
+    from app.routes import cards_changed
+
+    fmt = fmt or ('csv' if source.name.endswith('.csv') else 'ndjson')
+    aborted = None
+    try:
+        summary = import_cards(catalog, source, fmt, batch_size)
+    except ImportAborted as e:
+        aborted, summary = e, e.summary
+    if summary['inserted']:
+        cards_changed(catalog)
+    for error in summary['errors']:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    if aborted is not None:
+        click.echo(str(aborted), err=True)
+    click.echo(f"Imported {summary['inserted']} {catalog} cards, {summary['failed']} rows failed.")
+    if summary['failed'] or aborted is not None:
+        click.get_current_context().exit(1)
@@ -0,0 +1,101 @@
+import hashlib
+import time
+from functools import wraps
+
+from flask import Response, current_app, request
+
+from app.local_cache import LocalCache
+from app.replicas import replicas
+
+
+class CatalogCache(LocalCache):
+    # Caches the serialized card catalog responses. Each catalog has a
+    # version that every card write bumps; responses are cached per version
+    # and page, as named by the view's key function, and served with a
+    # content-hash ETag so clients can revalidate with If-None-Match and get
+    # an empty 304 back. Each catalog keeps at most CATALOG_CACHE_MAX_ENTRIES
+    # responses and CATALOG_CACHE_MAX_BYTES of bodies, dropping the oldest
+    # first, for up to CATALOG_CACHE_TTL seconds.
+
+    extension = 'catalog_cache'
+    ttl_setting = 'CATALOG_CACHE_TTL'
+    default_ttl = 60
+
+    def init_app(self, app):
+        app.config.setdefault('CATALOG_CACHE_MAX_ENTRIES', 256)
+        app.config.setdefault('CATALOG_CACHE_MAX_BYTES', 16 * 1024 * 1024)
+        super().init_app(app)
+
+    def initial_state(self):
+        return {'versions': {}, 'entries': {}, 'sizes': {}}
+
+    def version(self, catalog):
+        return self._state()['versions'].get(catalog, 0)
+
+    def bump(self, catalog):
+        state = self._state()
+        with state['lock']:
+            state['versions'][catalog] = state['versions'].get(catalog, 0) + 1
+            state['entries'].pop(catalog, None)
+            state['sizes'].pop(catalog, None)
+
+    def _get(self, catalog, version, key):
+        state = self._state()
+        with state['lock']:
+            entry = state['entries'].get(catalog, {}).get((version, key))
+        if entry is None or self._expired(entry[3]):
+            return None
+        return entry
+
+    def _put(self, catalog, version, key, body, mimetype):
+        state = self._state()
+        entry = (hashlib.sha1(body).hexdigest(), body, mimetype, time.monotonic())
+        max_entries = current_app.config['CATALOG_CACHE_MAX_ENTRIES']
+        max_bytes = current_app.config['CATALOG_CACHE_MAX_BYTES']
+        with state['lock']:
+            # A write that landed while the response was built makes it
+            # stale, and a body over the whole budget is never kept
+            if state['versions'].get(catalog, 0) != version or len(body) > max_bytes:
+                return entry
+            entries = state['entries'].setdefault(catalog, {})
+            size = state['sizes'].get(catalog, 0)
+            previous = entries.pop((version, key), None)
+            if previous is not None:
+                size -= len(previous[1])
+            while entries and (len(entries) >= max_entries or size + len(body) > max_bytes):
+                size -= len(entries.pop(next(iter(entries)))[1])
+            entries[(version, key)] = entry
+            state['sizes'][catalog] = size + len(body)
+        return entry
+
+    def cached(self, catalog, page_key):
+        # Decorate a catalog GET view so that its 200 responses are served
+        # from the cache with an ETag, honouring If-None-Match. page_key maps
+        # the request's arguments to a hashable key and raises ValueError for
+        # arguments the view rejects, which are passed to it uncached.
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                try:
+                    key = page_key(request.args)
+                except ValueError:
+                    return view(*args, **kwargs)
+                version = self.version(catalog)
+                entry = self._get(catalog, version, key)
+                if entry is None:
+                    replicas.use_primary()
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    entry = self._put(catalog, version, key, response.get_data(), response.mimetype)
+
+                etag, body, mimetype, _ = entry
+                response = Response(body, mimetype=mimetype)
+                response.set_etag(etag)
+                response.cache_control.no_cache = True
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
+
+
+catalog_cache = CatalogCache()
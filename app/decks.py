@@ -0,0 +1,145 @@
+import random
+import sys
+import time
+from array import array
+from collections import namedtuple
+
+from app import db
+from app.local_cache import LocalCache
+from app.models import ChallengeCard, BonusCard
+from app.replicas import replicas
+
+
+DrawnChallengeCard = namedtuple('DrawnChallengeCard', 'id title description key_considerations bonus_points')
+DrawnBonusCard = namedtuple('DrawnBonusCard', 'id name effect scoring_rules')
+
+DECKS = {
+    'challenge': (ChallengeCard, DrawnChallengeCard),
+    'bonus': (BonusCard, DrawnBonusCard),
+}
+
+
+def pack_deck(card_ids):
+    # Card ids are stored as little-endian uint32, four bytes per card
+    packed = array('I', card_ids)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_deck(data):
+    card_ids = array('I')
+    card_ids.frombytes(data or b'')
+    if sys.byteorder == 'big':
+        card_ids.byteswap()
+    return card_ids
+
+
+class DeckSnapshot:
+    # An immutable, id-indexed copy of one card table
+
+    def __init__(self, cards):
+        self.cards = {card.id: card for card in cards}
+        self.ids = tuple(self.cards)
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def get(self, card_id):
+        return self.cards.get(card_id)
+
+
+class CardDecks(LocalCache):
+    # Keeps one snapshot per deck in memory so start_round can draw cards
+    # without scanning and sorting the card tables. Card writes call
+    # invalidate() and the next draw reloads the deck with a single query,
+    # as does the first draw after CARD_DECK_TTL seconds.
+
+    extension = 'card_decks'
+    ttl_setting = 'CARD_DECK_TTL'
+    default_ttl = 60
+
+    def initial_state(self):
+        return {'snapshots': {}}
+
+    def snapshot(self, deck):
+        state = self._state()
+        snapshot = state['snapshots'].get(deck)
+        if snapshot is not None and not self._expired(snapshot.loaded_at):
+            return snapshot
+
+        with state['lock']:
+            snapshot = state['snapshots'].get(deck)
+            if snapshot is None or self._expired(snapshot.loaded_at):
+                snapshot = self._load(deck)
+                state['snapshots'][deck] = snapshot
+        return snapshot
+
+    def _load(self, deck):
+        model, card_type = DECKS[deck]
+        columns = [getattr(model, name) for name in card_type._fields]
+        replicas.use_primary()
+        rows = db.session.execute(db.select(*columns).order_by(model.id)).all()
+        return DeckSnapshot(card_type(*row) for row in rows)
+
+    def invalidate(self, deck=None):
+        state = self._state()
+        with state['lock']:
+            if deck is None:
+                state['snapshots'].clear()
+            else:
+                state['snapshots'].pop(deck, None)
+
+    def deal(self, game_session, seed=None):
+        # Fix the session's card order up front by sampling each deck without
+        # replacement. The same seed and catalog always deal the same decks.
+        if seed is None:
+            seed = random.SystemRandom().randrange(2 ** 31)
+        rng = random.Random(seed)
+        size = game_session.number_of_rounds
+
+        challenge_ids = self.snapshot('challenge').ids
+        bonus_ids = self.snapshot('bonus').ids
+        game_session.deck_seed = seed
+        game_session.challenge_deck = pack_deck(rng.sample(challenge_ids, min(size, len(challenge_ids))))
+        game_session.bonus_deck = pack_deck(rng.sample(bonus_ids, min(size, len(bonus_ids))))
+        game_session.deck_cursor = 0
+
+    def draw_next(self, game_session):
+        # Draw the cards at the session's cursor and advance it. A deck with
+        # no cards left to draw yields None and leaves the cursor in place.
+        if not game_session.challenge_deck or not game_session.bonus_deck:
+            # The catalog was empty when the session was created
+            self.deal(game_session, game_session.deck_seed)
+
+        cursor = game_session.deck_cursor or 0
+        challenge_card = self._card_at('challenge', unpack_deck(game_session.challenge_deck), cursor)
+        bonus_card = self._card_at('bonus', unpack_deck(game_session.bonus_deck), cursor)
+        if challenge_card is not None and bonus_card is not None:
+            game_session.deck_cursor = cursor + 1
+        return challenge_card, bonus_card
+
+    def _card_at(self, deck, card_ids, cursor):
+        # Decks wrap around once every card has been drawn. Cards deleted
+        # since the deal are skipped in favour of the next one in order.
+        snapshot = self.snapshot(deck)
+        for offset in range(len(card_ids)):
+            card = snapshot.get(card_ids[(cursor + offset) % len(card_ids)])
+            if card is not None:
+                return card
+        return None
+
+    def round_cards(self, current_round):
+        # Resolve a round's cards from the snapshots, falling back to a
+        # primary key lookup when a card is not in the snapshot
+        challenge_card = self.snapshot('challenge').get(current_round.challenge_card_id)
+        if challenge_card is None and current_round.challenge_card_id is not None:
+            challenge_card = db.session.get(ChallengeCard, current_round.challenge_card_id)
+        bonus_card = self.snapshot('bonus').get(current_round.bonus_card_id)
+        if bonus_card is None and current_round.bonus_card_id is not None:
+            bonus_card = db.session.get(BonusCard, current_round.bonus_card_id)
+        return challenge_card, bonus_card
+
+
+decks = CardDecks()
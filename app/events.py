@@ -0,0 +1,81 @@
+import json
+import queue
+import threading
+
+from flask import Response, current_app
+
+
+class SessionEvents:
+    # In-process fan-out of game session events to Server-Sent Events
+    # clients. Write routes publish once after committing and every client
+    # subscribed to that session in this process gets the event from its own
+    # queue, so watching a round costs no database reads. A client that
+    # falls SSE_QUEUE_SIZE events behind misses the events that don't fit.
+    # Each connected client holds a worker thread, so the stream needs a
+    # threaded or async server.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SSE_KEEPALIVE', 15)
+        app.config.setdefault('SSE_QUEUE_SIZE', 100)
+        app.extensions['session_events'] = {'lock': threading.Lock(), 'subscribers': {}}
+
+    def _state(self):
+        return current_app.extensions['session_events']
+
+    def subscribe(self, game_session_id):
+        subscriber = queue.Queue(maxsize=current_app.config['SSE_QUEUE_SIZE'])
+        state = self._state()
+        with state['lock']:
+            state['subscribers'].setdefault(game_session_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, game_session_id, subscriber, state=None):
+        state = state or self._state()
+        with state['lock']:
+            subscribers = state['subscribers'].get(game_session_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del state['subscribers'][game_session_id]
+
+    def publish(self, game_session_id, event, data):
+        state = self._state()
+        with state['lock']:
+            subscribers = list(state['subscribers'].get(game_session_id, ()))
+        if not subscribers:
+            return
+        message = f'event: {event}\ndata: {json.dumps(data)}\n\n'
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                pass
+
+    def response(self, game_session_id):
+        # Subscribe now and stream SSE messages to one client. The stream
+        # needs neither the app context nor a database connection, and the
+        # subscription is dropped when the server closes the response.
+        state = self._state()
+        keepalive = current_app.config['SSE_KEEPALIVE']
+        subscriber = self.subscribe(game_session_id)
+
+        def messages():
+            yield f'retry: {keepalive * 1000}\n\n'
+            while True:
+                try:
+                    yield subscriber.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+
+        response = Response(messages(), mimetype='text/event-stream')
+        response.cache_control.no_cache = True
+        response.headers['X-Accel-Buffering'] = 'no'
+        response.call_on_close(lambda: self.unsubscribe(game_session_id, subscriber, state))
+        return response
+
+
+session_events = SessionEvents()
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+
+import click
+from flask import current_app
+
+from app import db
+from app.models import DesignSubmission, GameSession, Round, Team
+from app.shards import shards
+
+
+# One exported row per submission. Sessions without rounds and rounds
+# without submissions get a row of their own with the missing parts empty.
+EXPORT_COLUMNS = (
+    ('game_session_id', GameSession.id),
+    ('game_session_name', GameSession.name),
+    ('number_of_rounds', GameSession.number_of_rounds),
+    ('created_at', GameSession.created_at),
+    ('round_id', Round.id),
+    ('round_number', Round.round_number),
+    ('challenge_card_id', Round.challenge_card_id),
+    ('bonus_card_id', Round.bonus_card_id),
+    ('submission_id', DesignSubmission.id),
+    ('team_id', Team.id),
+    ('team_name', Team.name),
+    ('team_score', Team.score),
+    ('score', DesignSubmission.score),
+    ('design_data', DesignSubmission.design_data),
+)
+
+EXPORT_CONTENT_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+def history_query(game_session_id=None):
+    query = (
+        db.select(*(column for _, column in EXPORT_COLUMNS))
+        .select_from(GameSession)
+        .outerjoin(Round, Round.game_session_id == GameSession.id)
+        .outerjoin(DesignSubmission, DesignSubmission.round_id == Round.id)
+        .outerjoin(Team, Team.id == DesignSubmission.team_id)
+        .order_by(GameSession.id, Round.round_number, DesignSubmission.id)
+    )
+    if game_session_id is not None:
+        query = query.where(GameSession.id == game_session_id)
+    return query
+
+
+def export_history(fmt, game_session_id=None, chunk_size=None):
+    # Yield the export as text, one chunk of rows at a time. The rows are
+    # read through a server-side cursor chunk_size at a time (yield_per), so
+    # memory use stays flat however many submissions there are.
+    if fmt not in EXPORT_CONTENT_TYPES:
+        raise ValueError(f'Unsupported export format: {fmt}')
+    chunk_size = chunk_size or current_app.config['HISTORY_EXPORT_CHUNK_SIZE']
+    names = [name for name, _ in EXPORT_COLUMNS]
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(names)
+        yield buffer.getvalue()
+
+    # Shard by shard when sharded, so sessions are in id order within a shard
+    keys = shards.keys()
+    if game_session_id is not None:
+        try:
+            keys = [shards.key_for(game_session_id)]
+        except LookupError:
+            keys = []
+    for shard in keys:
+        with shards.use(shard):
+            result = db.session.execute(history_query(game_session_id).execution_options(yield_per=chunk_size))
+            for rows in result.partitions():
+                if fmt == 'csv':
+                    buffer.seek(0)
+                    buffer.truncate()
+                    writer.writerows(rows)
+                    yield buffer.getvalue()
+                else:
+                    yield ''.join(json.dumps(dict(zip(names, row)), default=str) + '\n' for row in rows)
+
+
+@click.command('export-history')
+@click.option('--format', 'fmt', type=click.Choice(sorted(EXPORT_CONTENT_TYPES)), default='ndjson', show_default=True)
+@click.option('--game-session-id', type=int, help='Export a single game session.')
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-',
+              help='File to write to; stdout by default.')
+def export_history_command(fmt, game_session_id, output):
+    """Export game sessions with their rounds, submissions and scores."""
+    for chunk in export_history(fmt, game_session_id):
+        output.write(chunk)
@@ -0,0 +1,144 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from flask import current_app
+
+from app import db
+from app.decks import decks
+from app.events import session_events
+from app.leaderboard import leaderboards
+from app.models import Round, ScoringJob
+from app.scoring import apply_scores, evaluate, load_submissions, scoring_context
+from app.shards import shards
+from app.snapshots import snapshots
+
+
+class ScoringJobs:
+    # Scores rounds off the request path. Each job is coordinated by a
+    # background thread that splits the round's submissions into chunks,
+    # evaluates them on a process pool, records progress on the ScoringJob
+    # row and commits the scores once every chunk is done.
+    # SCORING_JOB_WORKERS = 0 evaluates the chunks in the coordinator thread.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SCORING_JOB_WORKERS', None)
+        app.config.setdefault('SCORING_JOB_CHUNK_SIZE', 500)
+        app.extensions['scoring_jobs'] = {
+            'lock': threading.Lock(),
+            'pool': None,
+            'runner': None,
+            'futures': {},
+        }
+
+    def _state(self, app=None):
+        return (app or current_app).extensions['scoring_jobs']
+
+    def _executors(self, app):
+        state = self._state(app)
+        with state['lock']:
+            if state['runner'] is None:
+                workers = app.config['SCORING_JOB_WORKERS']
+                if workers != 0:
+                    state['pool'] = ProcessPoolExecutor(max_workers=workers or os.cpu_count())
+                state['runner'] = ThreadPoolExecutor(max_workers=2, thread_name_prefix='scoring-job')
+        return state['runner'], state['pool']
+
+    def submit(self, job):
+        app = current_app._get_current_object()
+        runner, pool = self._executors(app)
+        job_id = job.id
+        future = runner.submit(self._run, app, pool, job_id)
+        futures = self._state(app)['futures']
+        futures[job_id] = future
+        # Runs straight away when the job has already finished
+        future.add_done_callback(lambda done: futures.pop(job_id, None))
+        return future
+
+    def wait(self, job_id, timeout=None):
+        # Block until a job started by this process has finished
+        future = self._state()['futures'].get(job_id)
+        if future is not None:
+            future.result(timeout)
+
+    def shutdown(self, app=None):
+        state = self._state(app)
+        with state['lock']:
+            if state['runner'] is not None:
+                state['runner'].shutdown(wait=True)
+            if state['pool'] is not None:
+                state['pool'].shutdown(wait=True)
+            state['runner'] = state['pool'] = None
+
+    def _run(self, app, pool, job_id):
+        with app.app_context(), shards.use(shards.key_for(job_id)):
+            try:
+                self._score(app, pool, job_id)
+            except Exception as e:
+                db.session.rollback()
+                db.session.execute(
+                    db.update(ScoringJob)
+                    .where(ScoringJob.id == job_id)
+                    .values(status='failed', error=str(e), finished_at=db.func.current_timestamp())
+                )
+                db.session.commit()
+            finally:
+                db.session.remove()
+
+    def _score(self, app, pool, job_id):
+        job = db.session.get(ScoringJob, job_id)
+        current_round = db.session.get(Round, job.round_id)
+        game_session_id, round_number = job.game_session_id, current_round.round_number
+        submissions = load_submissions(job.round_id)
+        context = scoring_context(*decks.round_cards(current_round))
+        rule_sets = app.config.get('SCORING_RULE_SETS')
+
+        job.status = 'running'
+        job.total = len(submissions)
+        db.session.commit()
+
+        size = app.config['SCORING_JOB_CHUNK_SIZE']
+        chunks = [submissions[i:i + size] for i in range(0, len(submissions), size)]
+        if pool is not None:
+            pending = [
+                pool.submit(evaluate, [submission.design_data for submission in chunk], context, rule_sets)
+                for chunk in chunks
+            ]
+        else:
+            pending = [None] * len(chunks)
+
+        scores = []
+        for chunk, future in zip(chunks, pending):
+            if future is not None:
+                scores.extend(future.result())
+            else:
+                scores.extend(evaluate([submission.design_data for submission in chunk], context, rule_sets))
+            db.session.execute(
+                db.update(ScoringJob).where(ScoringJob.id == job_id).values(completed=len(scores))
+            )
+            db.session.commit()
+
+        team_totals = apply_scores(submissions, scores)
+        db.session.execute(
+            db.update(ScoringJob)
+            .where(ScoringJob.id == job_id)
+            .values(status='completed', completed=len(scores), finished_at=db.func.current_timestamp())
+        )
+        generation = leaderboards.begin_deltas()
+        db.session.commit()
+        leaderboards.apply_deltas(team_totals, generation)
+        snapshots.invalidate(game_session_id)
+        session_events.publish(game_session_id, 'round-scored', {
+            'round_number': round_number,
+            'results': [
+                {'team_id': submission.team_id, 'score': score}
+                for submission, score in zip(submissions, scores)
+            ]
+        })
+
+
+jobs = ScoringJobs()
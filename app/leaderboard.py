@@ -0,0 +1,196 @@
+import time
+from bisect import bisect_left, insort
+from collections import namedtuple
+
+from app import db
+from app.local_cache import LocalCache
+from app.models import Team
+from app.replicas import replicas
+from app.shards import shards
+
+
+LeaderboardEntry = namedtuple('LeaderboardEntry', 'team_id name game_session_id score')
+
+
+def entry_for(team):
+    return LeaderboardEntry(team.id, team.name, team.game_session_id, team.score or 0)
+
+
+class Ranking:
+    # Teams ordered by score, highest first, as a sorted list of
+    # (-score, team_id) keys. Ties share a rank.
+
+    def __init__(self, keys=()):
+        # Sorting the keys once is O(n log n), where adding them one by one
+        # would be quadratic
+        self.keys = sorted(keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, team_id, score):
+        insort(self.keys, (-score, team_id))
+
+    def remove(self, team_id, score):
+        index = bisect_left(self.keys, (-score, team_id))
+        if index < len(self.keys) and self.keys[index] == (-score, team_id):
+            del self.keys[index]
+
+    def rank(self, score):
+        # One more than the number of teams with a strictly higher score
+        return bisect_left(self.keys, (-score,)) + 1
+
+    def page(self, offset, limit):
+        return [team_id for _, team_id in self.keys[offset:offset + limit]]
+
+
+class Leaderboards(LocalCache):
+    # Keeps the global and per-session rankings in memory. They are loaded
+    # with one query on first use, then kept current by apply_deltas() when
+    # rounds are scored and update_teams() when teams are created or their
+    # scores are set. Other changes call invalidate(), and rankings are
+    # reloaded after LEADERBOARD_TTL seconds.
+    #
+    # Loads run outside the lock, so reads keep being served from the
+    # current board meanwhile, and the new board is swapped in whole. Every
+    # write bumps a generation counter, and a board remembers the generation
+    # it was loaded at, which orders loads against writes: a load that
+    # overlapped a write can't tell whether its rows include it, so it is
+    # dropped in favour of the board the write was applied to.
+
+    extension = 'leaderboards'
+    ttl_setting = 'LEADERBOARD_TTL'
+    default_ttl = 30
+
+    def initial_state(self):
+        return {'board': None, 'generation': 0, 'loaded_at': None, 'loading': False, 'writes': 0}
+
+    def _board(self):
+        # The current board, loading one first when it is missing or older
+        # than LEADERBOARD_TTL. A stale board is still served while another
+        # request reloads it.
+        state = self._state()
+        with state['lock']:
+            board = state['board']
+            if board is not None and (not self._expired(state['loaded_at']) or state['loading']):
+                return board
+            state['loading'] = True
+            generation = state['writes']
+
+        try:
+            loaded_at = time.monotonic()
+            replicas.use_primary()
+            rows = []
+            for shard in shards.keys():
+                with shards.use(shard):
+                    rows.extend(db.session.execute(db.select(Team.id, Team.name, Team.game_session_id, Team.score)))
+            loaded = self._build(LeaderboardEntry(row.id, row.name, row.game_session_id, row.score or 0) for row in rows)
+        finally:
+            with state['lock']:
+                state['loading'] = False
+
+        with state['lock']:
+            if state['writes'] == generation:
+                state['board'], state['generation'], state['loaded_at'] = loaded, generation, loaded_at
+            elif state['board'] is None:
+                # Nothing to fall back on: serve this board, but have writes
+                # that began before now and the next read reload it
+                state['board'], state['generation'], state['loaded_at'] = loaded, state['writes'], None
+            return state['board']
+
+    def _build(self, entries):
+        teams = {}
+        session_keys = {}
+        for entry in entries:
+            teams[entry.team_id] = entry
+            if entry.game_session_id is not None:
+                session_keys.setdefault(entry.game_session_id, []).append((-entry.score, entry.team_id))
+        return {
+            'teams': teams,
+            'global': Ranking((-entry.score, entry.team_id) for entry in teams.values()),
+            'sessions': {game_session_id: Ranking(keys) for game_session_id, keys in session_keys.items()},
+        }
+
+    def _insert(self, board, entry):
+        board['teams'][entry.team_id] = entry
+        board['global'].add(entry.team_id, entry.score)
+        if entry.game_session_id is not None:
+            board['sessions'].setdefault(entry.game_session_id, Ranking()).add(entry.team_id, entry.score)
+
+    def _remove(self, board, entry):
+        del board['teams'][entry.team_id]
+        board['global'].remove(entry.team_id, entry.score)
+        if entry.game_session_id is not None:
+            board['sessions'][entry.game_session_id].remove(entry.team_id, entry.score)
+
+    def _ranking(self, board, game_session_id):
+        if game_session_id is None:
+            return board['global']
+        return board['sessions'].get(game_session_id, Ranking())
+
+    def invalidate(self):
+        state = self._state()
+        with state['lock']:
+            state['writes'] += 1
+            state['board'] = None
+
+    def begin_deltas(self):
+        # Call before committing round scores and pass the result to
+        # apply_deltas() once they are committed
+        state = self._state()
+        with state['lock']:
+            state['writes'] += 1
+            return state['writes']
+
+    def apply_deltas(self, team_totals, generation):
+        # Add committed round scores to the teams' totals. A board loaded at
+        # or after `generation` (from begin_deltas()) may already include
+        # them, so it is dropped and reloaded instead.
+        state = self._state()
+        with state['lock']:
+            board = state['board']
+            if board is None:
+                return
+            if state['generation'] >= generation or not all(team_id in board['teams'] for team_id in team_totals):
+                state['board'] = None
+                return
+            for team_id, delta in team_totals.items():
+                entry = board['teams'][team_id]
+                self._remove(board, entry)
+                self._insert(board, entry._replace(score=entry.score + delta))
+
+    def update_teams(self, entries):
+        # Insert new teams or overwrite the stored score of existing ones
+        state = self._state()
+        with state['lock']:
+            state['writes'] += 1
+            board = state['board']
+            if board is None:
+                return
+            for entry in entries:
+                previous = board['teams'].get(entry.team_id)
+                if previous is not None:
+                    self._remove(board, previous)
+                self._insert(board, entry)
+
+    def top(self, game_session_id=None, offset=0, limit=10):
+        # One page of the ranking as (rank, entry) pairs, and the ranking's size
+        board = self._board()
+        with self._state()['lock']:
+            ranking = self._ranking(board, game_session_id)
+            entries = [board['teams'][team_id] for team_id in ranking.page(offset, limit)]
+            return [(ranking.rank(entry.score), entry) for entry in entries], len(ranking)
+
+    def rank_of(self, team_id, within_session=False):
+        # Returns (rank, entry, total) in the global ranking, or in the
+        # team's own session with within_session. None for an unknown team.
+        board = self._board()
+        with self._state()['lock']:
+            entry = board['teams'].get(team_id)
+            if entry is None:
+                return None
+            ranking = self._ranking(board, entry.game_session_id if within_session else None)
+            return ranking.rank(entry.score), entry, len(ranking)
+
+
+leaderboards = Leaderboards()
@@ -0,0 +1,37 @@
+import threading
+import time
+
+from flask import current_app
+
+
+class LocalCache:
+    # Base for the caches each worker process keeps in memory. Subclasses
+    # name their app.extensions entry and TTL setting, and add their own
+    # state to the lock kept there. Invalidation only reaches the process
+    # that made the write, so what a cache holds is trusted for the TTL at
+    # most; writes made by other worker processes are picked up once it
+    # runs out. A TTL of None keeps entries until they are invalidated.
+
+    extension = None
+    ttl_setting = None
+    default_ttl = None
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault(self.ttl_setting, self.default_ttl)
+        app.extensions[self.extension] = {'lock': threading.Lock(), **self.initial_state()}
+
+    def initial_state(self):
+        return {}
+
+    def _state(self):
+        return current_app.extensions[self.extension]
+
+    def _expired(self, stored_at):
+        # Whether something stored at the time.monotonic() reading
+        # `stored_at` (None for never) is past the TTL
+        ttl = current_app.config[self.ttl_setting]
+        return stored_at is None or (ttl is not None and time.monotonic() - stored_at >= ttl)
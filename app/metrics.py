@@ -0,0 +1,164 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, current_app, g, has_request_context, request, request_finished, request_started
+from sqlalchemy import event
+
+from app import db
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        # Cumulative (le, count) pairs ending with +Inf
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+
+class Metrics:
+    # Records per-endpoint request latency, SQL statements, database time and
+    # rows per request, hooked into Flask's request signals and the
+    # SQLAlchemy engines' cursor events, and serves them on /metrics in the
+    # Prometheus text format. Recording is a few dict updates under one lock
+    # per request, so it is meant to stay on in production. Rows are counted
+    # from the cursor's rowcount, which some drivers (SQLite) do not report
+    # for SELECT statements.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.extensions['metrics'] = self._empty_state()
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        request_started.connect(self._request_started, app, weak=False)
+        request_finished.connect(self._request_finished, app, weak=False)
+        with app.app_context():
+            for engine in db.engines.values():
+                self.instrument_engine(engine)
+        app.add_url_rule('/metrics', 'metrics', self.render)
+
+    def _empty_state(self):
+        return {
+            'lock': threading.Lock(),
+            'latency': {},
+            'requests': {},
+            'queries': {},
+            'query_totals': {},
+        }
+
+    def instrument_engine(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _request_started(self, sender, **extra):
+        g.metrics = {'start': time.perf_counter(), 'queries': 0, 'db_time': 0.0, 'rows': 0}
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context.metrics_query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not has_request_context():
+            return
+        stats = g.get('metrics')
+        if stats is None:
+            return
+        stats['queries'] += 1
+        stats['db_time'] += time.perf_counter() - context.metrics_query_start
+        if cursor.rowcount > 0:
+            stats['rows'] += cursor.rowcount
+
+    def _request_finished(self, sender, response, **extra):
+        stats = g.get('metrics')
+        if stats is None:
+            return
+        elapsed = time.perf_counter() - stats['start']
+        endpoint = request.endpoint or 'unmatched'
+        key = (endpoint, request.method)
+
+        state = sender.extensions['metrics']
+        with state['lock']:
+            if key not in state['latency']:
+                state['latency'][key] = Histogram(LATENCY_BUCKETS)
+                state['queries'][key] = Histogram(QUERY_COUNT_BUCKETS)
+                state['query_totals'][key] = [0, 0.0, 0]
+            state['latency'][key].observe(elapsed)
+            state['queries'][key].observe(stats['queries'])
+            totals = state['query_totals'][key]
+            totals[0] += stats['queries']
+            totals[1] += stats['db_time']
+            totals[2] += stats['rows']
+            status_key = key + (response.status_code,)
+            state['requests'][status_key] = state['requests'].get(status_key, 0) + 1
+
+    def render(self):
+        state = current_app.extensions['metrics']
+        with state['lock']:
+            lines = []
+            lines += _histogram_lines(
+                'http_request_duration_seconds', 'Request latency by endpoint.', state['latency'])
+            lines += _counter_lines(
+                'http_requests_total', 'Requests by endpoint and status.',
+                {(endpoint, method, str(status)): count
+                 for (endpoint, method, status), count in state['requests'].items()},
+                ('endpoint', 'method', 'status'))
+            lines += _histogram_lines(
+                'db_queries_per_request', 'SQL statements executed per request.', state['queries'])
+            lines += _counter_lines(
+                'db_queries_total', 'SQL statements executed.',
+                {key: totals[0] for key, totals in state['query_totals'].items()})
+            lines += _counter_lines(
+                'db_query_duration_seconds_total', 'Time spent executing SQL statements.',
+                {key: totals[1] for key, totals in state['query_totals'].items()})
+            lines += _counter_lines(
+                'db_rows_total', 'Rows reported by the driver for SQL statements.',
+                {key: totals[2] for key, totals in state['query_totals'].items()})
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+def _labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(name, help_text, histograms):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+    for key, histogram in sorted(histograms.items()):
+        for bound, count in histogram.samples():
+            lines.append(f'{name}_bucket{_labels(("endpoint", "method"), key, le=bound)} {count}')
+        lines.append(f'{name}_sum{_labels(("endpoint", "method"), key)} {histogram.sum}')
+        lines.append(f'{name}_count{_labels(("endpoint", "method"), key)} {sum(histogram.counts)}')
+    return lines
+
+
+def _counter_lines(name, help_text, values, label_names=('endpoint', 'method')):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+    for key, value in sorted(values.items()):
+        lines.append(f'{name}{_labels(label_names, key)} {value}')
+    return lines
+
+
+metrics = Metrics()
@@ -1,5 +1,25 @@
+import zlib
+
 from app import db
 
+
+class CompressedText(db.TypeDecorator):
+    # Text stored zlib-compressed in a binary column. Values are compressed
+    # on write and decompressed on read, so the attribute is still a str.
+    impl = db.LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.compress(value.encode('utf-8'))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.decompress(value).decode('utf-8')
+
+
 class MaterialCard(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(128), nullable=False)
@@ -31,20 +51,41 @@ class GameSession(db.Model):
     teams = db.relationship('Team', backref='game_session', lazy=True)
     created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
     rounds = db.relationship('Round', backref='game_session', lazy=True)
+    # Pre-shuffled card order for the session, packed as uint32 card ids
+    deck_seed = db.Column(db.Integer, nullable=True)
+    challenge_deck = db.Column(db.LargeBinary, nullable=True)
+    bonus_deck = db.Column(db.LargeBinary, nullable=True)
+    deck_cursor = db.Column(db.Integer, nullable=False, default=0)
+    # Bumped on every update; the ORM updates the row only while it still
+    # has the version that was read and raises StaleDataError otherwise
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
 
 class Round(db.Model):
+    __table_args__ = (
+        db.Index('ix_round_game_session_id_round_number', 'game_session_id', 'round_number'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     round_number = db.Column(db.Integer, nullable=False)
     game_session_id = db.Column(db.Integer, db.ForeignKey('game_session.id'))
-    challenge_card_id = db.Column(db.Integer, db.ForeignKey('ChallengeCard.id'))
-    bonus_card_id = db.Column(db.Integer, db.ForeignKey('BonusCard.id'))
+    # Cards live in the catalog database, which needn't be the round's
+    # shard, so these are plain ids rather than foreign keys
+    challenge_card_id = db.Column(db.Integer)
+    bonus_card_id = db.Column(db.Integer)
 
 
 class DesignSubmission(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('team_id', 'round_id', name='uq_design_submission_team_id_round_id'),
+        db.Index('ix_design_submission_round_id_team_id', 'round_id', 'team_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    team_id = db.Column(db.Integer, db.ForeignKey('Team.id'))
-    round_id = db.Column(db.Integer, db.ForeignKey('Round.id'))
-    design_data = db.Column(db.Text, nullable=False)  # Could store JSON or any design-related data
+    team_id = db.Column(db.Integer, db.ForeignKey('team.id'))
+    round_id = db.Column(db.Integer, db.ForeignKey('round.id'))
+    design_data = db.Column(CompressedText, nullable=False)  # Could store JSON or any design-related data
     score = db.Column(db.Integer, nullable=True)
 
 
@@ -56,8 +97,9 @@ class User(db.Model):
 
 class Team(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(128), nullable=False)
-    game_session_id = db.Column(db.Integer, db.ForeignKey('game_session.id'))
+    name = db.Column(db.String(128), nullable=False, index=True)
+    game_session_id = db.Column(db.Integer, db.ForeignKey('game_session.id'), index=True)
+    score = db.Column(db.Integer, nullable=False, default=0)
     users = db.relationship('User', backref='team', lazy=True)
 
     def add_user(self, user):
@@ -65,3 +107,14 @@ class Team(db.Model):
             self.users.append(user)
         else:
             raise ValueError("Team cannot have more than 5 users.")
+
+class ScoringJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    game_session_id = db.Column(db.Integer, db.ForeignKey('game_session.id'))
+    round_id = db.Column(db.Integer, db.ForeignKey('round.id'))
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, completed, failed
+    total = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=db.func.current_timestamp())
+    finished_at = db.Column(db.DateTime, nullable=True)
@@ -0,0 +1,69 @@
+from flask import current_app
+
+from app import db
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def parse_page_args(args, model, default_fields):
+    # Read limit/after/fields from the query string and validate them
+    max_limit = current_app.config['CATALOG_MAX_PAGE_SIZE']
+    try:
+        limit = int(args.get('limit', current_app.config['CATALOG_PAGE_SIZE']))
+        after = int(args.get('after', 0))
+    except ValueError:
+        raise PaginationError('limit and after must be integers.')
+    if limit < 1 or limit > max_limit:
+        raise PaginationError(f'limit must be between 1 and {max_limit}.')
+
+    if args.get('fields'):
+        fields = [name.strip() for name in args['fields'].split(',') if name.strip()]
+    else:
+        fields = list(default_fields)
+
+    columns = model.__table__.columns
+    unknown = [name for name in fields if name not in columns]
+    if unknown:
+        raise PaginationError(f'Unknown fields: {", ".join(unknown)}.')
+
+    # The cursor is keyed on id, so it is always loaded
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+
+    return limit, after, fields
+
+
+def keyset_page(model, fields, limit, after=0):
+    # Only the requested columns are selected, and "id > after" walks the
+    # primary key index so deep pages cost the same as the first one
+    columns = [getattr(model, name) for name in fields]
+    rows = db.session.execute(
+        db.select(*columns)
+        .where(model.id > after)
+        .order_by(model.id)
+        .limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1].id
+
+    items = [dict(zip(fields, row)) for row in rows]
+    return items, next_cursor
+
+
+def is_paginated(args):
+    return any(name in args for name in ('limit', 'after', 'fields'))
+
+
+def page_key(args, model, default_fields):
+    # The validated page a query string asks for, in a hashable form that
+    # is the same however the arguments were spelled; None for a request
+    # that isn't paginated. Raises PaginationError like parse_page_args.
+    if not is_paginated(args):
+        return None
+    limit, after, fields = parse_page_args(args, model, default_fields)
+    return limit, after, tuple(fields)
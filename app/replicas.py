@@ -0,0 +1,129 @@
+import itertools
+import threading
+import time
+from functools import partial
+
+import sqlalchemy as sa
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+from app.shards import shards
+
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def is_write(clause):
+    return isinstance(clause, sa.sql.dml.UpdateBase) or getattr(clause, '_for_update_arg', None) is not None
+
+
+def request_routing():
+    # Per-request routing state; kept in the WSGI environ so it never
+    # outlives the request, unlike g or the scoped session
+    return request.environ.setdefault('material_mastery.db_routing', {})
+
+
+class RoutingSession(Session):
+    # Queries on game session data go to the selected shard, when sharding
+    # is configured. Other reads made while handling GET and HEAD requests
+    # go to a healthy read replica. Once such a request flushes or executes
+    # a write, it stays on the primary so that it reads its own writes, and
+    # so does a request that fills an in-memory cache (see use_primary()).
+    # Every other request, background job and CLI command uses the primary.
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            engine = shards.engine(mapper, clause)
+            if engine is not None:
+                return engine
+        if bind is None and has_request_context() and request.method in READ_METHODS:
+            routing = request_routing()
+            if self._flushing or is_write(clause):
+                routing['primary'] = True
+            elif not routing.get('primary'):
+                engine = replicas.engine()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class Replicas:
+    # Picks the read replica for a request. REPLICA_BINDS names the
+    # SQLALCHEMY_BINDS entries that replicate the primary database; requests
+    # take turns across them. A replica is checked with SELECT 1 at most
+    # every REPLICA_HEALTH_CHECK_INTERVAL seconds, and marked unhealthy
+    # straight away when a query loses its connection to it. When no
+    # replica is healthy, reads fall back to the primary. Replicas lag
+    # behind the primary, while the in-memory caches are versioned by writes
+    # to the primary, so the caches fill themselves from the primary with
+    # use_primary().
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('REPLICA_BINDS', ())
+        app.config.setdefault('REPLICA_HEALTH_CHECK_INTERVAL', 5)
+        state = {'lock': threading.Lock(), 'health': {}, 'turn': itertools.count()}
+        app.extensions['replicas'] = state
+
+        with app.app_context():
+            engines = app.extensions['sqlalchemy'].engines
+            for key in app.config['REPLICA_BINDS']:
+                event.listen(engines[key], 'handle_error', partial(self._handle_error, state, key))
+
+    def _state(self):
+        return current_app.extensions['replicas']
+
+    def _handle_error(self, state, key, context):
+        if context.is_disconnect:
+            with state['lock']:
+                state['health'][key] = (False, time.monotonic())
+
+    def engine(self):
+        # The engine the current request reads from, or None for the primary
+        routing = request_routing()
+        if 'replica' not in routing:
+            routing['replica'] = self._choose()
+        if routing['replica'] is None:
+            return None
+        return current_app.extensions['sqlalchemy'].engines[routing['replica']]
+
+    def use_primary(self):
+        # Send the rest of the current request's reads to the primary
+        if has_request_context():
+            request_routing()['primary'] = True
+
+    def _choose(self):
+        binds = current_app.config['REPLICA_BINDS']
+        if not binds:
+            return None
+        start = next(self._state()['turn'])
+        for i in range(len(binds)):
+            key = binds[(start + i) % len(binds)]
+            if self.healthy(key):
+                return key
+        return None
+
+    def healthy(self, key):
+        state = self._state()
+        interval = current_app.config['REPLICA_HEALTH_CHECK_INTERVAL']
+        with state['lock']:
+            healthy, checked_at = state['health'].get(key, (None, 0))
+        if healthy is not None and time.monotonic() - checked_at < interval:
+            return healthy
+
+        try:
+            with current_app.extensions['sqlalchemy'].engines[key].connect() as connection:
+                connection.execute(sa.text('SELECT 1'))
+            healthy = True
+        except sa.exc.DBAPIError:
+            healthy = False
+        with state['lock']:
+            state['health'][key] = (healthy, time.monotonic())
+        return healthy
+
+
+replicas = Replicas()
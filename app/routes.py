@@ -1,9 +1,29 @@
-from flask import Blueprint, jsonify, request
+import io
+from concurrent import futures
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context, url_for
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.orm.exc import StaleDataError
 
 from app import db
+from app.card_import import FORMATS, ImportAborted, import_cards
+from app.catalog_cache import catalog_cache
+from app.decks import decks
+from app.events import session_events
+from app.history_export import EXPORT_CONTENT_TYPES, export_history
+from app.jobs import jobs
+from app.leaderboard import LeaderboardEntry, entry_for, leaderboards
 from app.models import MaterialCard
-from app.models import ChallengeCard
-from app.models import Team, User
+from app.models import ChallengeCard, BonusCard
+from app.models import GameSession, Round, DesignSubmission
+from app.models import Team
+from app.models import ScoringJob
+from app.shards import shards
+from app.snapshots import snapshots
+from app.submissions import DuplicateSubmission, insert_submissions, submission_batcher
+from app.teams import create_teams, existing_team_names, team_error
+from app.scoring import apply_scores, load_submissions, score_submissions
+from app.pagination import PaginationError, is_paginated, keyset_page, page_key, parse_page_args
 
 
 bp = Blueprint('main', __name__)
@@ -12,17 +32,88 @@ bp = Blueprint('main', __name__)
 def index():
     return "<h1>Welcome to Material Mastery!</h1>"
 
+def cards_changed(catalog):
+    # Card writes invalidate the cached catalog responses, the card deck and
+    # the session snapshots that show the cards
+    catalog_cache.bump(catalog)
+    decks.invalidate(catalog)
+    snapshots.invalidate()
+
+def session_changed(game_session_id):
+    # Changes to a session's rounds or teams invalidate its cached
+    # submit-design view and snapshot
+    if game_session_id is None:
+        return
+    submission_batcher.invalidate(game_session_id)
+    snapshots.invalidate(game_session_id)
+
+def session_conflict():
+    # Another request changed the game session since it was read
+    db.session.rollback()
+    return jsonify({'error': 'Game session was changed by another request. Reload it and try again.'}), 409
+
+# Each catalog's model and the fields its pages return by default
+CARD_PAGES = {
+    'material': (MaterialCard, ('id', 'name')),
+    'challenge': (ChallengeCard, ('id', 'title', 'description', 'key_considerations', 'bonus_points')),
+    'bonus': (BonusCard, ('id', 'name', 'effect', 'scoring_rules')),
+}
+
+def card_page_key(catalog):
+    # The catalog cache key: the page a request asks for
+    model, default_fields = CARD_PAGES[catalog]
+    return lambda args: page_key(args, model, default_fields)
+
+def paginated_cards(catalog):
+    # Serve one keyset page of a card catalog with only the requested columns
+    model, default_fields = CARD_PAGES[catalog]
+    try:
+        limit, after, fields = parse_page_args(request.args, model, default_fields)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+
+    items, next_cursor = keyset_page(model, fields, limit, after)
+    return jsonify({'items': items, 'next_cursor': next_cursor}), 200
+
 @bp.route('/material-cards', methods=['GET'])
+@catalog_cache.cached('material', card_page_key('material'))
 def get_material_cards():
+    if is_paginated(request.args):
+        return paginated_cards('material')
+
     cards = MaterialCard.query.all()
     return jsonify([card.name for card in cards])
 
+def import_catalog(catalog):
+    # Stream NDJSON or CSV cards from the request body into a catalog
+    fmt = request.args.get('format') or FORMATS.get(request.mimetype)
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'error': 'Send NDJSON (application/x-ndjson) or CSV (text/csv).'}), 415
+
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    try:
+        summary = import_cards(catalog, stream, fmt)
+    except ImportAborted as e:
+        # Batches before the bad input are already committed
+        db.session.rollback()
+        if e.summary['inserted']:
+            cards_changed(catalog)
+        return jsonify({'error': str(e), **e.summary}), 400
+    if summary['inserted']:
+        cards_changed(catalog)
+    return jsonify({'message': f"Imported {summary['inserted']} cards.", **summary}), 200
+
+@bp.route('/material-cards/import', methods=['POST'])
+def import_material_cards():
+    return import_catalog('material')
+
 @bp.route('/material-cards', methods=['POST'])
 def add_material_card():
     data = request.get_json()
     new_card = MaterialCard(name=data['name'], properties=data['properties'], uses=data['uses'])
     db.session.add(new_card)
     db.session.commit()
+    cards_changed('material')
     return jsonify({'message': 'Material card added successfully!'}), 201
 
 @bp.route('/material-cards/<int:id>', methods=['PUT'])
@@ -43,6 +134,7 @@ def update_material_card(id):
     # Commit the changes to the database
     try:
         db.session.commit()
+        cards_changed('material')
         return jsonify({'message': 'Material card updated successfully!', 'material_card': {
             'id': material_card.id,
             'name': material_card.name,
@@ -63,6 +155,7 @@ def delete_material_card(id):
         # Delete the material card from the database
         db.session.delete(material_card)
         db.session.commit()
+        cards_changed('material')
         return jsonify({'message': f'Material card with ID {id} deleted successfully!'}), 200
     except Exception as e:
         db.session.rollback()
@@ -71,7 +164,11 @@ def delete_material_card(id):
 # app/routes.py
 
 @bp.route('/challenge-cards', methods=['GET'])
+@catalog_cache.cached('challenge', card_page_key('challenge'))
 def get_challenge_cards():
+    if is_paginated(request.args):
+        return paginated_cards('challenge')
+
     # Query all challenge cards from the database
     challenge_cards = ChallengeCard.query.all()
     
@@ -90,6 +187,10 @@ def get_challenge_cards():
     # Return the serialized list as a JSON response
     return jsonify(result), 200
 
+@bp.route('/challenge-cards/import', methods=['POST'])
+def import_challenge_cards():
+    return import_catalog('challenge')
+
 @bp.route('/challenge-cards', methods=['POST'])
 def create_challenge_card():
     data = request.get_json()
@@ -112,6 +213,7 @@ def create_challenge_card():
     try:
         db.session.add(new_card)
         db.session.commit()
+        cards_changed('challenge')
         return jsonify({'message': 'Challenge card created successfully!', 'id': new_card.id}), 201
     except Exception as e:
         db.session.rollback()
@@ -130,27 +232,29 @@ def update_challenge_card(id):
         challenge_card.title = data['title']
     if 'description' in data:
         challenge_card.description = data['description']
-    if 'requirements' in data:
-        challenge_card.requirements = data['requirements']
+    if 'key_considerations' in data:
+        challenge_card.key_considerations = data['key_considerations']
+    if 'bonus_points' in data:
+        challenge_card.bonus_points = data['bonus_points']
 
     # Save the changes to the database
     try:
         db.session.commit()
+        cards_changed('challenge')
         return jsonify({
             'message': 'Challenge card updated successfully!',
             'challenge_card': {
                 'id': challenge_card.id,
                 'title': challenge_card.title,
                 'description': challenge_card.description,
-                'requirements': challenge_card.requirements
+                'key_considerations': challenge_card.key_considerations,
+                'bonus_points': challenge_card.bonus_points
             }
         }), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-bp = Blueprint('main', __name__)
-
 @bp.route('/challenge-cards/<int:id>', methods=['DELETE'])
 def delete_challenge_card(id):
     # Find the challenge card by ID
@@ -162,6 +266,7 @@ def delete_challenge_card(id):
     # Commit the change to the database
     try:
         db.session.commit()
+        cards_changed('challenge')
         return jsonify({'message': f'Challenge card {id} deleted successfully!'}), 200
     except Exception as e:
         db.session.rollback()
@@ -169,7 +274,11 @@ def delete_challenge_card(id):
 
 
 @bp.route('/bonus-cards', methods=['GET'])
+@catalog_cache.cached('bonus', card_page_key('bonus'))
 def get_bonus_cards():
+    if is_paginated(request.args):
+        return paginated_cards('bonus')
+
     bonus_cards = BonusCard.query.all()
     return jsonify([{
         'id': card.id,
@@ -198,6 +307,7 @@ def update_bonus_card(id):
     # Save the changes to the database
     try:
         db.session.commit()
+        cards_changed('bonus')
         return jsonify({
             'message': 'Bonus card updated successfully!',
             'bonus_card': {
@@ -212,6 +322,10 @@ def update_bonus_card(id):
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/bonus-cards/import', methods=['POST'])
+def import_bonus_cards():
+    return import_catalog('bonus')
+
 @bp.route('/bonus-cards', methods=['POST'])
 def add_bonus_card():
     # Parse the request data
@@ -232,6 +346,7 @@ def add_bonus_card():
     try:
         db.session.add(new_card)
         db.session.commit()
+        cards_changed('bonus')
         return jsonify({
             'message': 'Bonus card added successfully!',
             'bonus_card': {
@@ -257,6 +372,7 @@ def delete_bonus_card(id):
     # Commit the change to the database
     try:
         db.session.commit()
+        cards_changed('bonus')
         return jsonify({'message': f'Bonus card {id} deleted successfully!'}), 200
     except Exception as e:
         db.session.rollback()
@@ -278,36 +394,69 @@ def create_game_session():
         number_of_rounds=data['number_of_rounds']
     )
 
+    # Shuffle the session's decks; a fixed deck_seed makes the game reproducible
+    decks.deal(new_session, data.get('deck_seed'))
+
     # Add teams to the session
     for team_data in data['teams']:
         if 'name' in team_data:
             team = Team(name=team_data['name'])
             new_session.teams.append(team)
 
-    # Add the new session to the database
+    # Add the new session to the database, on the next shard in turn
     try:
-        db.session.add(new_session)
-        db.session.commit()
-        return jsonify({
-            'message': 'Game session created successfully!',
-            'game_session': {
-                'id': new_session.id,
-                'name': new_session.name,
-                'number_of_rounds': new_session.number_of_rounds,
-                'current_round': new_session.current_round,
-                'teams': [{'id': team.id, 'name': team.name} for team in new_session.teams]
-            }
-        }), 201
+        shard = shards.choose()
+        with shards.use(shard):
+            db.session.add(new_session)
+            db.session.flush()
+            if shard is not None:
+                shards.verify(new_session.id, shard)
+            db.session.commit()
+            leaderboards.update_teams(entry_for(team) for team in new_session.teams)
+            return jsonify({
+                'message': 'Game session created successfully!',
+                'game_session': {
+                    'id': new_session.id,
+                    'name': new_session.name,
+                    'number_of_rounds': new_session.number_of_rounds,
+                    'current_round': new_session.current_round,
+                    'deck_seed': new_session.deck_seed,
+                    'version': new_session.version,
+                    'teams': [{'id': team.id, 'name': team.name} for team in new_session.teams]
+                }
+            }), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-bp = Blueprint('main', __name__)
+@bp.route('/game-sessions/export', methods=['GET'])
+def export_game_sessions():
+    # Stream every session's rounds, submissions and scores as NDJSON or CSV
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_CONTENT_TYPES:
+        return jsonify({'error': 'Format must be ndjson or csv.'}), 400
+    game_session_id = request.args.get('game_session_id', type=int)
+
+    response = Response(
+        stream_with_context(export_history(fmt, game_session_id)), mimetype=EXPORT_CONTENT_TYPES[fmt]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=game-history.{fmt}'
+    return response
 
 @bp.route('/game-sessions/<int:id>', methods=['GET'])
 def get_game_session(id):
-    # Find the game session by ID
-    game_session = GameSession.query.get_or_404(id)
+    # Find the game session by ID, loading its teams in one extra query
+    game_session = GameSession.query.options(db.selectinload(GameSession.teams)).filter_by(id=id).first_or_404()
+
+    # The cards in play are the current round's cards, if it has started
+    cards_in_play = []
+    current_round = Round.query.filter_by(game_session_id=id, round_number=game_session.current_round).first()
+    if current_round:
+        challenge_card, bonus_card = decks.round_cards(current_round)
+        if challenge_card:
+            cards_in_play.append({'id': challenge_card.id, 'type': 'challenge', 'description': challenge_card.description})
+        if bonus_card:
+            cards_in_play.append({'id': bonus_card.id, 'type': 'bonus', 'description': bonus_card.effect})
 
     # Prepare the response data
     response = {
@@ -315,20 +464,34 @@ def get_game_session(id):
         'name': game_session.name,
         'number_of_rounds': game_session.number_of_rounds,
         'current_round': game_session.current_round,
+        'version': game_session.version,
         'teams': [{'id': team.id, 'name': team.name} for team in game_session.teams],
-        'cards_in_play': [{'id': card.id, 'type': card.type, 'description': card.description} for card in game_session.cards_in_play]
+        'cards_in_play': cards_in_play
     }
 
     return jsonify(response), 200
 
+@bp.route('/game-sessions/<int:id>/snapshot', methods=['GET'])
+def get_game_session_snapshot(id):
+    # The session's teams, rounds, cards, submission progress and standings
+    # in one response, served from memory until the session changes
+    snapshot = snapshots.get(id)
+    if snapshot is None:
+        abort(404)
+    return jsonify(snapshot), 200
+
 @bp.route('/game-sessions/<int:id>', methods=['PUT'])
 def update_game_session(id):
-    # Find the game session by ID
-    game_session = GameSession.query.get_or_404(id)
+    # Find the game session by ID, loading its teams in one extra query
+    game_session = GameSession.query.options(db.selectinload(GameSession.teams)).filter_by(id=id).first_or_404()
 
     # Parse the request data
     data = request.get_json()
 
+    # Clients can make the update conditional on the version they read
+    if 'version' in data and data['version'] != game_session.version:
+        return session_conflict()
+
     # Update the current round
     if 'current_round' in data:
         new_round = data['current_round']
@@ -337,25 +500,42 @@ def update_game_session(id):
         else:
             return jsonify({'error': 'Invalid round number.'}), 400
 
-    # Update team scores
+    # Update team scores; the session's teams are already loaded, so teams
+    # from the payload are matched by id without further queries
     if 'teams' in data:
+        teams_by_id = {team.id: team for team in game_session.teams}
         for team_data in data['teams']:
-            team = Team.query.filter_by(id=team_data['id'], game_session_id=game_session.id).first()
+            team = teams_by_id.get(team_data['id'])
             if team:
                 team.score = team_data.get('score', team.score)
 
-    # Save the changes to the database
+    # Every accepted update bumps the version, even one that changes only
+    # team scores, so that concurrent score edits conflict too
+    flag_modified(game_session, 'current_round')
+
+    # Save the changes to the database. The flush updates the session only
+    # if its version is unchanged, and the response is built before
+    # committing, since the commit expires every loaded object and reading
+    # them back would reload each team
     try:
-        db.session.commit()
-        return jsonify({
+        db.session.flush()
+        entries = [entry_for(team) for team in game_session.teams]
+        response = {
             'message': 'Game session updated successfully!',
             'game_session': {
                 'id': game_session.id,
                 'name': game_session.name,
                 'current_round': game_session.current_round,
+                'version': game_session.version,
                 'teams': [{'id': team.id, 'name': team.name, 'score': team.score} for team in game_session.teams]
             }
-        }), 200
+        }
+        db.session.commit()
+        leaderboards.update_teams(entries)
+        session_changed(id)
+        return jsonify(response), 200
+    except StaleDataError:
+        return session_conflict()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -371,6 +551,8 @@ def delete_game_session(id):
     # Commit the changes to the database
     try:
         db.session.commit()
+        leaderboards.invalidate()
+        session_changed(id)
         return jsonify({'message': f'Game session {id} deleted successfully!'}), 200
     except Exception as e:
         db.session.rollback()
@@ -388,13 +570,10 @@ def start_round(id):
     # Increment the round number
     game_session.current_round += 1
 
-    # Draw a random challenge card
-    challenge_card = ChallengeCard.query.order_by(db.func.random()).first()
+    # Draw the next cards from the session's shuffled decks
+    challenge_card, bonus_card = decks.draw_next(game_session)
     if not challenge_card:
         return jsonify({'error': 'No challenge cards available.'}), 400
-
-    # Draw a random bonus card
-    bonus_card = BonusCard.query.order_by(db.func.random()).first()
     if not bonus_card:
         return jsonify({'error': 'No bonus cards available.'}), 400
 
@@ -407,33 +586,50 @@ def start_round(id):
     )
     db.session.add(new_round)
 
-    # Save the changes to the database
+    # Save the changes to the database. The flush advances the session only
+    # if no other request changed it since it was read, so concurrent calls
+    # cannot both start the same round
     try:
+        db.session.flush()
+        round_data = {
+            'round_number': new_round.round_number,
+            'challenge_card': {
+                'id': challenge_card.id,
+                'title': challenge_card.title,
+                'description': challenge_card.description
+            },
+            'bonus_card': {
+                'id': bonus_card.id,
+                'name': bonus_card.name,
+                'effect': bonus_card.effect,
+                'scoring_rules': bonus_card.scoring_rules
+            }
+        }
+        version = game_session.version
         db.session.commit()
+        session_changed(id)
+        session_events.publish(id, 'round-started', round_data)
         return jsonify({
             'message': 'New round started successfully!',
-            'round': {
-                'round_number': new_round.round_number,
-                'challenge_card': {
-                    'id': challenge_card.id,
-                    'title': challenge_card.title,
-                    'description': challenge_card.description
-                },
-                'bonus_card': {
-                    'id': bonus_card.id,
-                    'name': bonus_card.name,
-                    'effect': bonus_card.effect,
-                    'scoring_rules': bonus_card.scoring_rules
-                }
-            }
+            'round': round_data,
+            'version': version
         }), 201
+    except StaleDataError:
+        return session_conflict()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
+def is_submission(team_id, design_data):
+    return isinstance(team_id, int) and not isinstance(team_id, bool) and isinstance(design_data, str)
+
 @bp.route('/game-sessions/<int:id>/submit-design', methods=['PUT'])
 def submit_design(id):
+    # Group-commit submissions with other requests when batching is on
+    if submission_batcher.enabled():
+        return submit_design_batched(id)
+
     # Find the game session by ID
     game_session = GameSession.query.get_or_404(id)
 
@@ -454,41 +650,138 @@ def submit_design(id):
     # Validate input
     if not team_id or not design_data:
         return jsonify({'error': 'Team ID and design data are required.'}), 400
+    if not is_submission(team_id, design_data):
+        return jsonify({'error': 'Team ID must be an integer and design data a string.'}), 400
 
     # Find the team
     team = Team.query.filter_by(id=team_id, game_session_id=game_session.id).first()
     if not team:
         return jsonify({'error': 'Team not found.'}), 404
 
-    # Check if the team already submitted a design for this round
-    existing_submission = DesignSubmission.query.filter_by(team_id=team.id, round_id=current_round.id).first()
-    if existing_submission:
-        return jsonify({'error': 'Design already submitted for this round.'}), 400
-
-    # Create a new design submission
-    submission = DesignSubmission(
-        team_id=team.id,
-        round_id=current_round.id,
-        design_data=design_data
-    )
-    db.session.add(submission)
-
-    # Save the changes to the database
+    # Insert the submission unless the team already submitted one for this
+    # round; the unique constraint decides atomically, so concurrent
+    # requests need no locking
+    team_id, round_id, round_number = team.id, current_round.id, current_round.round_number
     try:
+        submission_id = insert_submissions(
+            [{'team_id': team_id, 'round_id': round_id, 'design_data': design_data}]
+        ).get((team_id, round_id))
+        if submission_id is None:
+            db.session.rollback()
+            return jsonify({'error': 'Design already submitted for this round.'}), 409
+
+        # Save the changes to the database
         db.session.commit()
+        snapshots.invalidate(id)
+        session_events.publish(id, 'submission-received', {
+            'round_number': round_number,
+            'submission_id': submission_id,
+            'team_id': team_id
+        })
         return jsonify({
             'message': 'Design submitted successfully!',
             'submission': {
-                'id': submission.id,
-                'team_id': submission.team_id,
-                'round_id': submission.round_id,
-                'design_data': submission.design_data
+                'id': submission_id,
+                'team_id': team_id,
+                'round_id': round_id,
+                'design_data': design_data
             }
         }), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/game-sessions/<int:id>/events', methods=['GET'])
+def game_session_events(id):
+    # Stream round-started, submission-received and round-scored events as
+    # Server-Sent Events instead of polling round-results
+    GameSession.query.get_or_404(id)
+    # Release the connection before the long-lived stream starts
+    db.session.close()
+    return session_events.response(id)
+
+def is_summary(args):
+    return args.get('view') == 'summary'
+
+def submission_summary(game_session_id, submission_id, team_id, score):
+    return {
+        'id': submission_id,
+        'team_id': team_id,
+        'score': score,
+        'design_url': url_for('main.get_submission', id=game_session_id, submission_id=submission_id)
+    }
+
+@bp.route('/game-sessions/<int:id>/submissions/<int:submission_id>', methods=['GET'])
+def get_submission(id, submission_id):
+    # A single submission with its full design, for clients that list the
+    # round results in the summary view
+    row = db.session.execute(
+        db.select(DesignSubmission, Round.round_number)
+        .join(Round, DesignSubmission.round_id == Round.id)
+        .where(DesignSubmission.id == submission_id, Round.game_session_id == id)
+    ).first()
+    if row is None:
+        return jsonify({'error': 'Submission not found.'}), 404
+    submission, round_number = row
+    return jsonify({
+        'id': submission.id,
+        'team_id': submission.team_id,
+        'round_id': submission.round_id,
+        'round_number': round_number,
+        'design_data': submission.design_data,
+        'score': submission.score
+    }), 200
+
+def submit_design_batched(id):
+    # The same checks as submit_design, made against the cached session view
+    view = submission_batcher.view(id)
+    if view is None:
+        abort(404)
+    if view.current_round > view.number_of_rounds:
+        return jsonify({'error': 'No active round in progress.'}), 400
+    if view.round_id is None:
+        return jsonify({'error': 'Current round not found.'}), 404
+
+    data = request.get_json()
+    team_id = data.get('team_id')
+    design_data = data.get('design_data')
+    if not team_id or not design_data:
+        return jsonify({'error': 'Team ID and design data are required.'}), 400
+    if not is_submission(team_id, design_data):
+        return jsonify({'error': 'Team ID must be an integer and design data a string.'}), 400
+    if team_id not in view.team_ids:
+        return jsonify({'error': 'Team not found.'}), 404
+
+    # Release the connection while the submission waits for its batch
+    db.session.close()
+    try:
+        submission_id = submission_batcher.submit(team_id, view.round_id, design_data).result(
+            timeout=current_app.config['SUBMISSION_BATCH_TIMEOUT']
+        )
+    except DuplicateSubmission:
+        return jsonify({'error': 'Design already submitted for this round.'}), 409
+    except futures.TimeoutError:
+        return jsonify({'error': 'Design submission timed out. Check the round results before resubmitting.'}), 504
+    except Exception:
+        # The batcher's errors can quote other teams' rows, so they stay here
+        return jsonify({'error': 'Design submission failed.'}), 500
+
+    snapshots.invalidate(id)
+    session_events.publish(id, 'submission-received', {
+        'round_number': view.current_round,
+        'submission_id': submission_id,
+        'team_id': team_id
+    })
+    return jsonify({
+        'message': 'Design submitted successfully!',
+        'submission': {
+            'id': submission_id,
+            'team_id': team_id,
+            'round_id': view.round_id,
+            'design_data': design_data
+        }
+    }), 201
+
 @bp.route('/game-sessions/<int:id>/round-results', methods=['GET'])
 def get_round_results(id):
     # Find the game session by ID
@@ -499,17 +792,25 @@ def get_round_results(id):
     if not current_round:
         return jsonify({'error': 'Current round not found or not yet started.'}), 404
 
-    # Get all design submissions for the current round
-    submissions = DesignSubmission.query.filter_by(round_id=current_round.id).all()
-
-    # Prepare the results
-    results = []
-    for submission in submissions:
-        results.append({
-            'team_id': submission.team_id,
-            'design_data': submission.design_data,
-            'score': submission.score
-        })
+    # Get all design submissions for the current round. The summary view
+    # leaves the design data unloaded and links to each design instead.
+    query = DesignSubmission.query.filter_by(round_id=current_round.id)
+    if is_summary(request.args):
+        submissions = query.options(db.load_only(
+            DesignSubmission.id, DesignSubmission.team_id, DesignSubmission.round_id, DesignSubmission.score
+        )).order_by(DesignSubmission.id).all()
+        results = [submission_summary(id, submission.id, submission.team_id, submission.score) for submission in submissions]
+    else:
+        submissions = query.all()
+
+        # Prepare the results
+        results = []
+        for submission in submissions:
+            results.append({
+                'team_id': submission.team_id,
+                'design_data': submission.design_data,
+                'score': submission.score
+            })
 
     return jsonify({
         'round_number': current_round.round_number,
@@ -526,114 +827,264 @@ def score_round(id):
     if not current_round:
         return jsonify({'error': 'Current round not found or not yet started.'}), 404
 
-    # Get all design submissions for the current round
-    submissions = DesignSubmission.query.filter_by(round_id=current_round.id).all()
+    # Score the round in a background job when asked to
+    if request.args.get('mode') == 'async':
+        return enqueue_scoring_job(game_session, current_round)
+
+    # Get all design submissions for the current round as plain rows
+    submissions = load_submissions(current_round.id)
+    round_number = current_round.round_number
 
     if not submissions:
         return jsonify({'error': 'No submissions found for this round.'}), 400
 
-    # Calculate the scores
-    for submission in submissions:
-        # Implement your scoring logic here
-        # For example, you might calculate scores based on material selection, creativity, etc.
-        material_score = 50  # Placeholder value
-        creativity_score = 30  # Placeholder value
-        total_score = material_score + creativity_score
-
-        # Update the submission with the calculated score
-        submission.score = total_score
-
-        # Update the team's total score
-        team = Team.query.get(submission.team_id)
-        team.score += total_score
+    # Calculate all the scores in one batch, then write them and the team
+    # totals with a fixed number of statements
+    scores = score_submissions(submissions, current_round)
+    team_totals = apply_scores(submissions, scores)
 
     # Save the changes to the database
     try:
+        generation = leaderboards.begin_deltas()
         db.session.commit()
-        return jsonify({
-            'message': 'Round scored successfully!',
-            'round_number': current_round.round_number,
+        leaderboards.apply_deltas(team_totals, generation)
+        snapshots.invalidate(id)
+        session_events.publish(id, 'round-scored', {
+            'round_number': round_number,
             'results': [
+                {'team_id': submission.team_id, 'score': score}
+                for submission, score in zip(submissions, scores)
+            ]
+        })
+        if is_summary(request.args):
+            results = [
+                submission_summary(id, submission.id, submission.team_id, score)
+                for submission, score in zip(submissions, scores)
+            ]
+        else:
+            results = [
                 {
                     'team_id': submission.team_id,
                     'design_data': submission.design_data,
-                    'score': submission.score
-                } for submission in submissions
+                    'score': score
+                } for submission, score in zip(submissions, scores)
             ]
+        return jsonify({
+            'message': 'Round scored successfully!',
+            'round_number': round_number,
+            'results': results
         }), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def enqueue_scoring_job(game_session, current_round):
+    # Count the submissions without loading their design data
+    total = db.session.scalar(
+        db.select(db.func.count(DesignSubmission.id)).where(DesignSubmission.round_id == current_round.id)
+    )
+    if not total:
+        return jsonify({'error': 'No submissions found for this round.'}), 400
+
+    job = ScoringJob(game_session_id=game_session.id, round_id=current_round.id, total=total)
+    try:
+        db.session.add(job)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    jobs.submit(job)
+    return jsonify({
+        'message': 'Scoring job queued.',
+        'job_id': job.id,
+        'status_url': url_for('main.get_job', id=job.id)
+    }), 202
+
+@bp.route('/jobs/<int:id>', methods=['GET'])
+def get_job(id):
+    job = ScoringJob.query.get_or_404(id)
+    return jsonify({
+        'id': job.id,
+        'game_session_id': job.game_session_id,
+        'round_id': job.round_id,
+        'status': job.status,
+        'total': job.total,
+        'completed': job.completed,
+        'progress': job.completed / job.total if job.total else 0.0,
+        'error': job.error
+    }), 200
+
 @bp.route('/leaderboards', methods=['GET'])
 def get_leaderboards():
-    # Query the top teams sorted by score in descending order
-    top_teams = Team.query.order_by(Team.score.desc()).all()
+    # Read the page bounds and the optional game session scope
+    try:
+        offset = int(request.args.get('offset', 0))
+        limit = int(request.args.get('limit', current_app.config['LEADERBOARD_PAGE_SIZE']))
+        game_session_id = request.args.get('game_session_id', type=int)
+    except ValueError:
+        return jsonify({'error': 'offset and limit must be integers.'}), 400
+    max_limit = current_app.config['LEADERBOARD_MAX_PAGE_SIZE']
+    if offset < 0 or limit < 1 or limit > max_limit:
+        return jsonify({'error': f'offset must not be negative and limit must be between 1 and {max_limit}.'}), 400
+
+    # Serve the page from the maintained in-memory ranking
+    page, total = leaderboards.top(game_session_id, offset, limit)
 
     # Prepare the leaderboard data
     leaderboard = [{
-        'team_id': team.id,
-        'team_name': team.name,
-        'score': team.score
-    } for team in top_teams]
+        'rank': rank,
+        'team_id': entry.team_id,
+        'team_name': entry.name,
+        'score': entry.score
+    } for rank, entry in page]
+
+    return jsonify({
+        'leaderboard': leaderboard,
+        'total': total,
+        'offset': offset,
+        'limit': limit,
+        'next_offset': offset + limit if offset + limit < total else None
+    }), 200
+
+@bp.route('/leaderboards/teams/<int:team_id>', methods=['GET'])
+def get_team_rank(team_id):
+    # Rank the team globally, or within its own game session with scope=session
+    within_session = request.args.get('scope') == 'session'
+    result = leaderboards.rank_of(team_id, within_session)
+    if result is None:
+        return jsonify({'error': 'Team not found.'}), 404
 
+    rank, entry, total = result
     return jsonify({
-        'leaderboard': leaderboard
+        'team_id': entry.team_id,
+        'team_name': entry.name,
+        'game_session_id': entry.game_session_id,
+        'score': entry.score,
+        'rank': rank,
+        'total': total,
+        'scope': 'session' if within_session else 'global'
     }), 200
-     
+
 
 @bp.route('/teams', methods=['POST'])
 def create_team():
     data = request.get_json()
-    
-    # Check if team name is provided
-    if 'name' not in data or not data['name']:
-        return jsonify({'error': 'Team name is required'}), 400
-
-    # Check if users are provided
-    if 'users' not in data or len(data['users']) == 0:
-        return jsonify({'error': 'At least one user is required to create a team'}), 400
 
-    # Check if more than 5 users are provided
-    if len(data['users']) > 5:
-        return jsonify({'error': 'A team cannot have more than 5 users'}), 400
+    # Check the team name and its users
+    error = team_error(data)
+    if error:
+        return jsonify({'error': error}), 400
 
     # Check if the team name already exists
-    existing_team = Team.query.filter_by(name=data['name']).first()
-    if existing_team:
+    if existing_team_names([data['name']]):
         return jsonify({'error': 'Team name already exists'}), 400
 
-    # Create a new team
-    team = Team(name=data['name'])
-    db.session.add(team)
-
-    # Add users to the team
-    for user_data in data['users']:
-        user = User.query.filter_by(email=user_data['email']).first()
-        if not user:
-            user = User(username=user_data['username'], email=user_data['email'])
-            db.session.add(user)
-        team.add_user(user)
+    # The team goes on its game session's shard
+    try:
+        shard = shards.key_for(data.get('game_session_id'))
+    except LookupError:
+        return jsonify({'error': 'Game session not found'}), 404
+
+    with shards.use(shard):
+        # Create the team, looking up all of its users at once and inserting
+        # the missing ones together
+        try:
+            created = create_teams([data])[0]
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
+
+        # Commit the changes to the database
+        try:
+            db.session.commit()
+            leaderboards.update_teams([LeaderboardEntry(created['id'], created['name'], created['game_session_id'], 0)])
+            session_changed(created['game_session_id'])
+            return jsonify({'message': 'Team created successfully!', 'team': created['name'], 'users': created['users']}), 201
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
+
+@bp.route('/teams/bulk', methods=['POST'])
+def create_teams_bulk():
+    data = request.get_json()
+    teams_data = data.get('teams') if isinstance(data, dict) else None
+    if not teams_data or not isinstance(teams_data, list):
+        return jsonify({'error': 'A list of teams is required'}), 400
+
+    # Validate every team up front and report all the problems at once
+    errors = []
+    names = set()
+    for index, team_data in enumerate(teams_data):
+        error = team_error(team_data)
+        if not error and team_data['name'] in names:
+            error = 'Team name is repeated in the request'
+        if not error:
+            try:
+                shards.key_for(team_data.get('game_session_id'))
+            except LookupError:
+                error = 'Game session not found'
+        if error:
+            errors.append({'index': index, 'error': error})
+        else:
+            names.add(team_data['name'])
+    taken = existing_team_names(names)
+    errors.extend(
+        {'index': index, 'error': 'Team name already exists'}
+        for index, team_data in enumerate(teams_data)
+        if isinstance(team_data, dict) and team_data.get('name') in taken
+    )
+    if errors:
+        return jsonify({'error': 'Invalid teams', 'errors': sorted(errors, key=lambda e: e['index'])}), 400
+
+    # Insert every team and user in one transaction with batched statements,
+    # per shard when the teams' sessions are on several
+    by_shard = {}
+    for index, team_data in enumerate(teams_data):
+        by_shard.setdefault(shards.key_for(team_data.get('game_session_id')), []).append(index)
+    created = [None] * len(teams_data)
+    try:
+        for shard, indexes in by_shard.items():
+            with shards.use(shard):
+                for index, team in zip(indexes, create_teams([teams_data[index] for index in indexes])):
+                    created[index] = team
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
 
-    # Commit the changes to the database
     try:
         db.session.commit()
-        return jsonify({'message': 'Team created successfully!', 'team': team.name, 'users': [user.email for user in team.users]}), 201
+        leaderboards.update_teams(
+            LeaderboardEntry(team['id'], team['name'], team['game_session_id'], 0) for team in created
+        )
+        for game_session_id in {team['game_session_id'] for team in created}:
+            session_changed(game_session_id)
+        return jsonify({'message': f'{len(created)} teams created successfully!', 'teams': created}), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @bp.route('/teams', methods=['GET'])
 def get_all_teams():
-    teams = Team.query.all()
+    # Load every team's users in one extra query per shard instead of one
+    # per team
     teams_list = []
-    
-    for team in teams:
-        team_data = {
-            'id': team.id,
-            'name': team.name,
-            'users': [{'id': user.id, 'username': user.username, 'email': user.email} for user in team.users]
-        }
-        teams_list.append(team_data)
+    for shard in shards.keys():
+        with shards.use(shard):
+            teams = Team.query.options(db.selectinload(Team.users)).order_by(Team.id).all()
+            for team in teams:
+                team_data = {
+                    'id': team.id,
+                    'name': team.name,
+                    'users': [{'id': user.id, 'username': user.username, 'email': user.email} for user in team.users]
+                }
+                teams_list.append(team_data)
+    teams_list.sort(key=lambda team: team['id'])
 
     return jsonify(teams_list), 200
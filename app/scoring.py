@@ -0,0 +1,209 @@
+import json
+import re
+from collections import defaultdict, namedtuple
+
+import numpy as np
+from flask import current_app
+
+from app import db
+from app.decks import decks
+from app.models import DesignSubmission, Team
+
+
+# Everything a rule set needs to know about the round being scored
+ScoringContext = namedtuple('ScoringContext', 'considerations bonus_points bonus_rules')
+
+MATERIAL_POINTS = 10
+MAX_SCORED_MATERIALS = 5
+CONSIDERATION_POINTS = 30
+
+RULE_SETS = {}
+
+
+def rule_set(name):
+    # Register a rule set. A rule set takes the round's DesignFeatures and
+    # ScoringContext and returns one score per submission as a NumPy array.
+    def decorator(func):
+        RULE_SETS[name] = func
+        return func
+    return decorator
+
+
+class DesignFeatures:
+    # Columnar view of a round's designs, one entry per submission. Each
+    # design is tokenised once into the round's vocabulary: `terms` holds the
+    # vocabulary index of every distinct word of every design and `rows` the
+    # design it belongs to, a sparse design x word membership matrix. A
+    # searched word is made of word characters only, so it occurs in a text
+    # exactly when it occurs in one of the text's words; mentions() finds
+    # those words in the vocabulary and looks their columns up.
+
+    def __init__(self, designs):
+        vocabulary = {}
+        terms = []
+        counts = []
+        material_counts = []
+        for design in designs:
+            text, materials = parse_design(design)
+            words = {vocabulary.setdefault(word, len(vocabulary)) for word in re.findall(r'\w+', text)}
+            terms.extend(words)
+            counts.append(len(words))
+            material_counts.append(len(materials))
+        self.vocabulary = vocabulary
+        self.terms = np.array(terms, dtype=np.int64)
+        self.rows = np.repeat(np.arange(len(counts)), counts)
+        self.material_count = np.array(material_counts, dtype=np.int64)
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.material_count)
+
+    def column(self, word):
+        # True for every design with a word containing `word`
+        if word not in self._columns:
+            matches = np.zeros(len(self.vocabulary), dtype=bool)
+            matches[[index for term, index in self.vocabulary.items() if word in term]] = True
+            found = np.zeros(len(self), dtype=bool)
+            found[self.rows[matches[self.terms]]] = True
+            self._columns[word] = found
+        return self._columns[word]
+
+    def mentions(self, phrase):
+        # True for every design that mentions each word of the phrase
+        words = [word for word in re.findall(r'\w+', phrase.lower()) if len(word) > 2]
+        found = np.ones(len(self), dtype=bool)
+        for word in words:
+            found &= self.column(word)
+        return found
+
+
+def parse_design(design):
+    # Designs are JSON documents when clients send them, plain text otherwise.
+    # Returns the lowercased searchable text and the set of materials used.
+    try:
+        data = json.loads(design)
+    except (TypeError, ValueError):
+        return str(design).lower(), set()
+
+    materials = set()
+    if isinstance(data, dict) and isinstance(data.get('materials'), list):
+        materials = {str(material).lower() for material in data['materials']}
+    return ' '.join(_strings(data)).lower(), materials
+
+
+def _strings(value):
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from _strings(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _strings(item)
+    elif value is not None:
+        yield str(value)
+
+
+def parse_considerations(key_considerations):
+    # "Thermal insulation, renewable materials." -> ['thermal insulation', 'renewable materials']
+    if not key_considerations:
+        return ()
+    return tuple(part.strip(' .').lower() for part in re.split(r'[,;\n]', key_considerations) if part.strip(' .'))
+
+
+def parse_scoring_rules(scoring_rules):
+    # "recycled:10, local materials: 5" -> [('recycled', 10), ('local materials', 5)].
+    # Entries that are not keyword:points pairs are ignored.
+    rules = []
+    for part in re.split(r'[,;\n]', scoring_rules or ''):
+        keyword, sep, points = part.rpartition(':')
+        if not sep or not keyword.strip():
+            continue
+        try:
+            rules.append((keyword.strip().lower(), int(points)))
+        except ValueError:
+            continue
+    return tuple(rules)
+
+
+def scoring_context(challenge_card, bonus_card):
+    return ScoringContext(
+        considerations=parse_considerations(challenge_card.key_considerations if challenge_card else None),
+        bonus_points=(challenge_card.bonus_points or 0) if challenge_card else 0,
+        bonus_rules=parse_scoring_rules(bonus_card.scoring_rules if bonus_card else None)
+    )
+
+
+@rule_set('materials')
+def score_materials(features, context):
+    return np.minimum(features.material_count, MAX_SCORED_MATERIALS) * MATERIAL_POINTS
+
+
+@rule_set('key_considerations')
+def score_key_considerations(features, context):
+    # Points in proportion to the challenge's key considerations the design
+    # addresses, plus the card's bonus points when it addresses all of them
+    if not context.considerations:
+        return np.zeros(len(features), dtype=np.int64)
+    covered = np.zeros(len(features), dtype=np.int64)
+    for consideration in context.considerations:
+        covered += features.mentions(consideration)
+    total = len(context.considerations)
+    scores = covered * CONSIDERATION_POINTS // total
+    return scores + np.where(covered == total, context.bonus_points, 0)
+
+
+@rule_set('bonus_card')
+def score_bonus_card(features, context):
+    scores = np.zeros(len(features), dtype=np.int64)
+    for keyword, points in context.bonus_rules:
+        scores += np.where(features.mentions(keyword), points, 0)
+    return scores
+
+
+def evaluate(designs, context, rule_sets=None):
+    # Score a whole round at once. Each rule set runs once over the columnar
+    # features, so past tokenising the designs the Python-level work grows
+    # with the rules and the round's vocabulary rather than rules x
+    # submissions.
+    features = DesignFeatures(designs)
+    totals = np.zeros(len(features), dtype=np.int64)
+    for name in rule_sets or RULE_SETS:
+        totals += RULE_SETS[name](features, context)
+    return totals.tolist()
+
+
+def load_submissions(round_id):
+    # The round's submissions as plain rows, which stay usable after commit
+    return db.session.execute(
+        db.select(DesignSubmission.id, DesignSubmission.team_id, DesignSubmission.design_data)
+        .where(DesignSubmission.round_id == round_id)
+        .order_by(DesignSubmission.id)
+    ).all()
+
+
+def score_submissions(submissions, current_round):
+    # Score a whole round in one batch. Each submission is a row with
+    # id, team_id and design_data; returns the scores in the same order.
+    context = scoring_context(*decks.round_cards(current_round))
+    designs = [submission.design_data for submission in submissions]
+    return evaluate(designs, context, current_app.config.get('SCORING_RULE_SETS'))
+
+
+def apply_scores(submissions, scores):
+    # Write the submission scores with one executemany UPDATE keyed on the
+    # primary key, then add each team's total in one grouped UPDATE
+    db.session.execute(
+        db.update(DesignSubmission),
+        [{'id': submission.id, 'score': score} for submission, score in zip(submissions, scores)]
+    )
+
+    team_totals = defaultdict(int)
+    for submission, score in zip(submissions, scores):
+        team_totals[submission.team_id] += score
+
+    db.session.execute(
+        db.update(Team)
+        .where(Team.id.in_(team_totals))
+        .values(score=Team.score + db.case(team_totals, value=Team.id, else_=0)),
+        execution_options={'synchronize_session': False}
+    )
+    return team_totals
@@ -0,0 +1,202 @@
+import itertools
+from contextlib import contextmanager
+from functools import partial
+
+import click
+import sqlalchemy as sa
+from flask import abort, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+
+# Tables whose rows live on the shard of their game session. Every other
+# table (the card catalogs) stays in the default database.
+SHARDED_TABLES = frozenset({'game_session', 'team', 'user', 'round', 'design_submission', 'scoring_job'})
+
+# Routes whose id is the id of a row on a shard, which selects that shard
+SHARDED_ROUTES = ('/game-sessions/<int:id>', '/jobs/<int:id>')
+
+SHARD_ENVIRON_KEY = 'material_mastery.shard'
+
+
+class ShardNotSelected(RuntimeError):
+    pass
+
+
+def is_sharded(mapper, clause):
+    table = None
+    if mapper is not None:
+        table = sa.inspect(mapper).local_table
+    elif isinstance(clause, sa.Table):
+        table = clause
+    elif isinstance(clause, sa.sql.dml.UpdateBase):
+        table = clause.table
+    return isinstance(table, sa.Table) and table.name in SHARDED_TABLES
+
+
+def selected_shard():
+    # Kept in the WSGI environ during requests, so it never outlives the
+    # request, and on g in background jobs and CLI commands
+    if has_request_context():
+        return request.environ.get(SHARD_ENVIRON_KEY)
+    return g.get('shard')
+
+
+def select_shard(key):
+    if has_request_context():
+        request.environ[SHARD_ENVIRON_KEY] = key
+    else:
+        g.shard = key
+
+
+class Shards:
+    # Spreads game sessions over the SHARD_BINDS databases. Ids on shard i
+    # leave remainder i when divided by SHARD_ID_STRIDE (see init-shards and
+    # _assign_ids), so the id of any session, team, round, submission or
+    # scoring job names its shard and ids never repeat across shards.
+    # Queries on the sharded tables go to the selected shard: routes under
+    # SHARDED_ROUTES select it from their id, and other code selects it with
+    # use(). New sessions take turns across the shards. With no SHARD_BINDS
+    # everything stays in the default database.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SHARD_BINDS', ())
+        app.config.setdefault('SHARD_ID_STRIDE', 64)
+        if len(app.config['SHARD_BINDS']) > app.config['SHARD_ID_STRIDE']:
+            raise ValueError('SHARD_ID_STRIDE must be at least the number of SHARD_BINDS')
+        app.extensions['shards'] = {'turn': itertools.count()}
+        app.before_request(self._select_for_request)
+
+        # PostgreSQL shards number their rows with the sequences set up by
+        # init-shards; on other databases the ids are assigned here
+        with app.app_context():
+            engines = app.extensions['sqlalchemy'].engines
+            for index, key in enumerate(app.config['SHARD_BINDS']):
+                if engines[key].dialect.name != 'postgresql':
+                    event.listen(
+                        engines[key], 'before_execute',
+                        partial(self._assign_ids, index, app.config['SHARD_ID_STRIDE']), retval=True
+                    )
+
+    def enabled(self):
+        return bool(current_app.config['SHARD_BINDS'])
+
+    def keys(self):
+        # Every shard's bind key, or just the default database's None
+        return current_app.config['SHARD_BINDS'] or (None,)
+
+    def key_for(self, id):
+        # The shard holding the row with this id; rows without a game
+        # session live on the first shard. LookupError for ids of no shard.
+        binds = current_app.config['SHARD_BINDS']
+        if not binds:
+            return None
+        if id is None:
+            return binds[0]
+        index = id % current_app.config['SHARD_ID_STRIDE']
+        if index >= len(binds):
+            raise LookupError(f'No shard holds id {id}')
+        return binds[index]
+
+    def verify(self, id, key):
+        # A row whose id doesn't name the shard it was inserted on can't be
+        # found again
+        try:
+            found = self.key_for(id)
+        except LookupError:
+            found = None
+        if found != key:
+            raise RuntimeError(f'{key} gave out id {id}, which does not name it; run `flask init-shards`')
+
+    def choose(self):
+        # The shard for a new game session
+        binds = current_app.config['SHARD_BINDS']
+        if not binds:
+            return None
+        return binds[next(current_app.extensions['shards']['turn']) % len(binds)]
+
+    @contextmanager
+    def use(self, key):
+        previous = selected_shard()
+        select_shard(key)
+        try:
+            yield
+        finally:
+            select_shard(previous)
+
+    def engine(self, mapper=None, clause=None):
+        # The selected shard's engine for a query on a sharded table, or
+        # None to leave the choice to the session
+        if not self.enabled() or not is_sharded(mapper, clause):
+            return None
+        key = selected_shard()
+        if key is None:
+            raise ShardNotSelected('Game session data was queried without selecting its shard')
+        return current_app.extensions['sqlalchemy'].engines[key]
+
+    def _assign_ids(self, index, stride, connection, statement, multiparams, params, execution_options):
+        # Give the new rows of a sharded table the next ids after the
+        # table's highest that name this shard. The highest id is read in
+        # the inserting transaction, which suits SQLite's single writer.
+        if not isinstance(statement, sa.sql.dml.Insert) or statement.table.name not in SHARDED_TABLES:
+            return statement, multiparams, params
+        rows = multiparams or ([params] if params else [])
+        if not rows or all(row.get('id') is not None for row in rows):
+            return statement, multiparams, params
+
+        highest = connection.scalar(sa.select(sa.func.max(statement.table.c.id))) or 0
+        next_id = highest + 1 + (index - highest - 1) % stride
+        numbered = []
+        for row in rows:
+            if row.get('id') is None:
+                row = {**row, 'id': next_id}
+                next_id += stride
+            numbered.append(row)
+        if multiparams:
+            return statement, numbered, {}
+        return statement, [], numbered[0]
+
+    def _select_for_request(self):
+        rule = request.url_rule
+        if rule is None or not self.enabled():
+            return
+        if any(rule.rule == prefix or rule.rule.startswith(prefix + '/') for prefix in SHARDED_ROUTES):
+            try:
+                select_shard(self.key_for(request.view_args['id']))
+            except LookupError:
+                abort(404)
+
+
+shards = Shards()
+
+
+@click.command('init-shards')
+def init_shards_command():
+    """Make the id sequences of the PostgreSQL shard databases name their shard."""
+    stride = current_app.config['SHARD_ID_STRIDE']
+    engines = current_app.extensions['sqlalchemy'].engines
+    for index, key in enumerate(current_app.config['SHARD_BINDS']):
+        engine = engines[key]
+        if engine.dialect.name != 'postgresql':
+            click.echo(f'{key}: ids are assigned by the application on {engine.dialect.name}')
+            continue
+        with engine.begin() as connection:
+            for table in sorted(SHARDED_TABLES):
+                name = engine.dialect.identifier_preparer.quote(table)
+                misplaced = connection.scalar(
+                    sa.text(f'SELECT count(*) FROM {name} WHERE id % :stride != :index'),
+                    {'stride': stride, 'index': index}
+                )
+                if misplaced:
+                    raise click.ClickException(f'{key}: {misplaced} {table} rows have ids of another shard')
+                # The next id after the highest one that names this shard
+                highest = connection.scalar(sa.text(f'SELECT coalesce(max(id), 0) FROM {name}'))
+                start = highest + 1 + (index - highest - 1) % stride
+                sequence = connection.scalar(
+                    sa.text('SELECT pg_get_serial_sequence(:table, :column)'), {'table': name, 'column': 'id'}
+                )
+                connection.execute(sa.text(f'ALTER SEQUENCE {sequence} INCREMENT BY {stride} RESTART WITH {start}'))
+        click.echo(f'{key}: new ids leave remainder {index} when divided by {stride}')
@@ -0,0 +1,146 @@
+import time
+
+from flask import current_app
+
+from app import db
+from app.decks import decks
+from app.local_cache import LocalCache
+from app.models import DesignSubmission, GameSession, Round, Team
+from app.replicas import replicas
+
+
+class SessionSnapshots(LocalCache):
+    # Caches one aggregated view per game session: its teams, rounds with
+    # their cards and submissions, the current round's progress and the
+    # standings. A snapshot is built with a fixed number of queries and
+    # every write route that touches the session invalidates it, or it is
+    # rebuilt after SESSION_SNAPSHOT_TTL seconds.
+
+    extension = 'session_snapshots'
+    ttl_setting = 'SESSION_SNAPSHOT_TTL'
+    default_ttl = 30
+
+    def init_app(self, app):
+        app.config.setdefault('SESSION_SNAPSHOT_MAX_ENTRIES', 1024)
+        super().init_app(app)
+
+    def initial_state(self):
+        return {'generations': {}, 'entries': {}}
+
+    def invalidate(self, game_session_id=None):
+        state = self._state()
+        with state['lock']:
+            # The None generation covers every session
+            state['generations'][game_session_id] = state['generations'].get(game_session_id, 0) + 1
+            if game_session_id is None:
+                state['entries'].clear()
+            else:
+                state['entries'].pop(game_session_id, None)
+
+    def get(self, game_session_id):
+        # The session's snapshot, or None if the session doesn't exist
+        state = self._state()
+        with state['lock']:
+            generation = (state['generations'].get(None, 0), state['generations'].get(game_session_id, 0))
+            entry = state['entries'].get(game_session_id)
+        if entry is not None and not self._expired(entry[1]):
+            return entry[0]
+
+        loaded_at = time.monotonic()
+        replicas.use_primary()
+        snapshot = build_snapshot(game_session_id)
+        if snapshot is None:
+            return None
+        with state['lock']:
+            # A write that landed while the snapshot was built makes it stale
+            current = (state['generations'].get(None, 0), state['generations'].get(game_session_id, 0))
+            if current == generation:
+                if len(state['entries']) >= current_app.config['SESSION_SNAPSHOT_MAX_ENTRIES']:
+                    state['entries'].clear()
+                state['entries'][game_session_id] = (snapshot, loaded_at)
+        return snapshot
+
+
+def build_snapshot(game_session_id):
+    # Five queries, plus one per card deck that isn't in memory, whatever
+    # the number of teams, users, rounds and submissions
+    game_session = db.session.get(
+        GameSession, game_session_id,
+        options=[db.defer(GameSession.challenge_deck), db.defer(GameSession.bonus_deck)]
+    )
+    if game_session is None:
+        return None
+    teams = (
+        Team.query.options(db.selectinload(Team.users))
+        .filter_by(game_session_id=game_session_id).order_by(Team.id).all()
+    )
+    rounds = Round.query.filter_by(game_session_id=game_session_id).order_by(Round.round_number).all()
+    submissions = db.session.execute(
+        db.select(DesignSubmission.id, DesignSubmission.team_id, DesignSubmission.round_id, DesignSubmission.score)
+        .join(Round, DesignSubmission.round_id == Round.id)
+        .where(Round.game_session_id == game_session_id)
+        .order_by(DesignSubmission.id)
+    ).all()
+
+    by_round = {}
+    for submission in submissions:
+        by_round.setdefault(submission.round_id, []).append(
+            {'id': submission.id, 'team_id': submission.team_id, 'score': submission.score}
+        )
+    challenge_deck, bonus_deck = decks.snapshot('challenge'), decks.snapshot('bonus')
+    round_data = []
+    current_round = None
+    for game_round in rounds:
+        challenge_card = challenge_deck.get(game_round.challenge_card_id)
+        bonus_card = bonus_deck.get(game_round.bonus_card_id)
+        round_submissions = by_round.get(game_round.id, [])
+        round_data.append({
+            'round_number': game_round.round_number,
+            'challenge_card': {
+                'id': challenge_card.id,
+                'title': challenge_card.title,
+                'description': challenge_card.description
+            } if challenge_card else None,
+            'bonus_card': {
+                'id': bonus_card.id,
+                'name': bonus_card.name,
+                'effect': bonus_card.effect
+            } if bonus_card else None,
+            'submissions': round_submissions,
+            'scored': bool(round_submissions) and all(s['score'] is not None for s in round_submissions)
+        })
+        if game_round.round_number == game_session.current_round:
+            current_round = (game_round, round_submissions)
+
+    round_status = None
+    if current_round is not None:
+        submitted = {submission['team_id'] for submission in current_round[1]}
+        round_status = {
+            'round_number': current_round[0].round_number,
+            'submitted_team_ids': sorted(submitted),
+            'pending_team_ids': [team.id for team in teams if team.id not in submitted]
+        }
+
+    # Teams with equal scores share a rank, as on the leaderboards
+    standings = []
+    for position, team in enumerate(sorted(teams, key=lambda team: (-team.score, team.id))):
+        rank = standings[-1]['rank'] if standings and standings[-1]['score'] == team.score else position + 1
+        standings.append({'rank': rank, 'team_id': team.id, 'team_name': team.name, 'score': team.score})
+
+    return {
+        'id': game_session.id,
+        'name': game_session.name,
+        'number_of_rounds': game_session.number_of_rounds,
+        'current_round': game_session.current_round,
+        'version': game_session.version,
+        'teams': [
+            {'id': team.id, 'name': team.name, 'score': team.score, 'users': [user.username for user in team.users]}
+            for team in teams
+        ],
+        'rounds': round_data,
+        'round_status': round_status,
+        'standings': standings
+    }
+
+
+snapshots = SessionSnapshots()
@@ -0,0 +1,233 @@
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import DesignSubmission, GameSession, Round, Team
+from app.shards import shards
+
+
+# What submit-design validates against: the session's round counters, the
+# current round's id (None before the first round) and the session's teams
+SessionView = namedtuple('SessionView', 'current_round number_of_rounds round_id team_ids loaded_at')
+
+
+UNIQUE_SUBMISSION = 'uq_design_submission_team_id_round_id'
+
+
+class DuplicateSubmission(Exception):
+    pass
+
+
+def insert_submissions(rows):
+    # Insert submission rows (dicts of team_id, round_id and design_data) in
+    # one INSERT ... ON CONFLICT DO NOTHING RETURNING statement, so the
+    # unique (team_id, round_id) constraint rejects duplicates atomically
+    # however many workers race. Returns {(team_id, round_id): id} for the
+    # rows that were inserted; the caller commits.
+    dialect = db.session.get_bind(DesignSubmission).dialect.name
+    if dialect == 'postgresql':
+        statement = postgresql.insert(DesignSubmission).on_conflict_do_nothing(constraint=UNIQUE_SUBMISSION)
+    elif dialect == 'sqlite':
+        statement = sqlite.insert(DesignSubmission).on_conflict_do_nothing(index_elements=['team_id', 'round_id'])
+    else:
+        # Without ON CONFLICT, insert row by row and skip the rows that the
+        # constraint rejects
+        inserted = {}
+        for row in rows:
+            try:
+                with db.session.begin_nested():
+                    inserted[(row['team_id'], row['round_id'])] = db.session.scalar(
+                        db.insert(DesignSubmission).returning(DesignSubmission.id), row
+                    )
+            except IntegrityError:
+                pass
+        return inserted
+
+    # With several rows, RETURNING comes back in no particular order (asking
+    # for parameter order makes SQLite send one INSERT per row), so the ids
+    # are matched back by key
+    returning = statement.returning(DesignSubmission.id, DesignSubmission.team_id, DesignSubmission.round_id)
+    if len(rows) == 1:
+        result = db.session.execute(returning, rows[0])
+    else:
+        result = db.session.execute(returning, rows)
+    return {(team_id, round_id): submission_id for submission_id, team_id, round_id in result}
+
+
+class SubmissionBatcher:
+    # Write-behind group commit for submit-design. Requests are validated
+    # against a cached SessionView and queue their submission; a flusher
+    # thread collects submissions for up to SUBMISSION_BATCH_WINDOW seconds
+    # (or SUBMISSION_BATCH_SIZE rows), writes them with one multi-row INSERT
+    # and one commit, and then answers each waiting request; when the batch
+    # fails, its rows are retried one by one so that a bad row fails alone.
+    # Requests wait at most SUBMISSION_BATCH_TIMEOUT seconds. Views are
+    # invalidated by this process's session writes and expire after
+    # SUBMISSION_VIEW_TTL seconds to pick up rounds started elsewhere, so a
+    # submission can land in the previous round for at most that long.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SUBMISSION_BATCHING', False)
+        app.config.setdefault('SUBMISSION_BATCH_WINDOW', 0.01)
+        app.config.setdefault('SUBMISSION_BATCH_SIZE', 500)
+        app.config.setdefault('SUBMISSION_VIEW_TTL', 5)
+        app.config.setdefault('SUBMISSION_BATCH_TIMEOUT', 30)
+        app.extensions['submission_batcher'] = {
+            'lock': threading.Lock(),
+            'views': {},
+            'pending': None,
+            'thread': None,
+        }
+
+    def _state(self, app=None):
+        return (app or current_app).extensions['submission_batcher']
+
+    def enabled(self):
+        return current_app.config['SUBMISSION_BATCHING']
+
+    def view(self, game_session_id):
+        state = self._state()
+        ttl = current_app.config['SUBMISSION_VIEW_TTL']
+        with state['lock']:
+            view = state['views'].get(game_session_id)
+        if view is not None and (ttl is None or time.monotonic() - view.loaded_at < ttl):
+            return view
+
+        loaded_at = time.monotonic()
+        game_session = db.session.execute(
+            db.select(GameSession.current_round, GameSession.number_of_rounds).where(GameSession.id == game_session_id)
+        ).first()
+        if game_session is None:
+            return None
+        round_id = db.session.scalar(
+            db.select(Round.id).where(Round.game_session_id == game_session_id,
+                                      Round.round_number == game_session.current_round)
+        )
+        team_ids = frozenset(db.session.scalars(db.select(Team.id).where(Team.game_session_id == game_session_id)))
+        view = SessionView(game_session.current_round, game_session.number_of_rounds, round_id, team_ids, loaded_at)
+        with state['lock']:
+            state['views'][game_session_id] = view
+        return view
+
+    def invalidate(self, game_session_id=None):
+        state = self._state()
+        with state['lock']:
+            if game_session_id is None:
+                state['views'].clear()
+            else:
+                state['views'].pop(game_session_id, None)
+
+    def submit(self, team_id, round_id, design_data):
+        # Queue a submission; the future resolves to its id once committed
+        app = current_app._get_current_object()
+        state = self._state(app)
+        with state['lock']:
+            if state['thread'] is None:
+                state['pending'] = queue.Queue()
+                state['thread'] = threading.Thread(
+                    target=self._flush_loop, args=(app, state['pending']), name='submission-batcher', daemon=True
+                )
+                state['thread'].start()
+            pending = state['pending']
+        future = Future()
+        pending.put(({'team_id': team_id, 'round_id': round_id, 'design_data': design_data}, future))
+        return future
+
+    def shutdown(self, app=None):
+        # Flush what is queued and stop the flusher thread
+        state = self._state(app)
+        with state['lock']:
+            thread, pending = state['thread'], state['pending']
+            state['thread'] = state['pending'] = None
+        if thread is not None:
+            pending.put(None)
+            thread.join()
+
+    def _flush_loop(self, app, pending):
+        window = app.config['SUBMISSION_BATCH_WINDOW']
+        size = app.config['SUBMISSION_BATCH_SIZE']
+        stopping = False
+        while not stopping:
+            item = pending.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + window
+            while len(batch) < size:
+                try:
+                    item = pending.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            with app.app_context():
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    db.session.rollback()
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                finally:
+                    db.session.remove()
+
+    def _write(self, batch):
+        # Reject duplicates within the batch in memory and against the table
+        # through the unique constraint, committing the batch once
+        entries = {}
+        for row, future in batch:
+            key = (row['team_id'], row['round_id'])
+            if key in entries:
+                future.set_exception(DuplicateSubmission())
+            else:
+                entries[key] = (row, future)
+        try:
+            ids = self._insert([row for row, _ in entries.values()])
+            db.session.commit()
+        except Exception:
+            # One bad row fails the whole statement, so write the rows one
+            # at a time and fail only the requests whose rows are rejected
+            db.session.rollback()
+            ids = {}
+            for row, future in entries.values():
+                try:
+                    ids.update(self._insert([row]))
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    future.set_exception(e)
+        for row, future in batch:
+            if future.done():
+                continue
+            submission_id = ids.get((row['team_id'], row['round_id']))
+            if submission_id is None:
+                future.set_exception(DuplicateSubmission())
+            else:
+                future.set_result(submission_id)
+
+    def _insert(self, rows):
+        # Rows go to their round's shard; one commit covers every shard
+        by_shard = {}
+        for row in rows:
+            by_shard.setdefault(shards.key_for(row['round_id']), []).append(row)
+        ids = {}
+        for shard, shard_rows in by_shard.items():
+            with shards.use(shard):
+                ids.update(insert_submissions(shard_rows))
+        return ids
+
+
+submission_batcher = SubmissionBatcher()
@@ -0,0 +1,117 @@
+from app import db
+from app.models import Team, User
+from app.shards import selected_shard, shards
+
+
+MAX_TEAM_SIZE = 5
+
+# Upper bound on values per IN (...) list, well inside every backend's limits
+LOOKUP_BATCH_SIZE = 500
+
+
+def team_error(data):
+    # Validate one team payload, returning the error message or None
+    if not isinstance(data, dict) or not data.get('name'):
+        return 'Team name is required'
+    if not data.get('users'):
+        return 'At least one user is required to create a team'
+    if len(data['users']) > MAX_TEAM_SIZE:
+        return f'A team cannot have more than {MAX_TEAM_SIZE} users'
+    if any(not isinstance(user, dict) or not user.get('email') for user in data['users']):
+        return 'Each user needs an email'
+    return None
+
+
+def _batches(values):
+    values = list(values)
+    for i in range(0, len(values), LOOKUP_BATCH_SIZE):
+        yield values[i:i + LOOKUP_BATCH_SIZE]
+
+
+def existing_team_names(names):
+    # Team names are unique across every shard
+    found = set()
+    for shard in shards.keys():
+        with shards.use(shard):
+            for batch in _batches(set(names)):
+                found.update(db.session.scalars(db.select(Team.name).where(Team.name.in_(batch))))
+    return found
+
+
+def existing_users(users_data):
+    # Users are unique by email and by username across every shard. Returns
+    # the users matching either as {email: (shard, id, username)}.
+    found = {}
+    for shard in shards.keys():
+        with shards.use(shard):
+            for batch in _batches(users_data):
+                emails = [user_data['email'] for user_data in batch]
+                usernames = [user_data['username'] for user_data in batch if user_data.get('username')]
+                rows = db.session.execute(
+                    db.select(User.id, User.email, User.username)
+                    .where(db.or_(User.email.in_(emails), User.username.in_(usernames)))
+                )
+                found.update((row.email, (shard, row.id, row.username)) for row in rows)
+    return found
+
+
+def create_teams(teams_data):
+    # Insert validated team payloads and their users on the selected shard
+    # with a fixed number of statements: one batched lookup of the users on
+    # each shard, then an INSERT ... RETURNING for the teams, an executemany
+    # INSERT for the new users and an executemany UPDATE moving existing
+    # users onto their new team. Users found on another shard move here by
+    # being deleted there and inserted again. Raises ValueError when a new
+    # user has no username or one that another user has taken.
+    shard = selected_shard()
+    users_data = [user_data for team_data in teams_data for user_data in team_data['users']]
+    found = existing_users(users_data)
+    taken = {username: email for email, (_, _, username) in found.items()}
+    for user_data in users_data:
+        if user_data['email'] in found:
+            continue
+        if not user_data.get('username'):
+            raise ValueError(f"User {user_data['email']} needs a username")
+        if taken.get(user_data['username'], user_data['email']) != user_data['email']:
+            raise ValueError(f"Username {user_data['username']} is taken")
+
+    # The names are distinct within the request, so the returned rows map
+    # back to their teams by name, whatever other requests insert meanwhile
+    team_ids = {
+        row.name: row.id
+        for row in db.session.execute(db.insert(Team).returning(Team.id, Team.name), [
+            {'name': team_data['name'], 'game_session_id': team_data.get('game_session_id'), 'score': 0}
+            for team_data in teams_data
+        ])
+    }
+
+    # A user listed under several teams ends up on the last one
+    new_users = {}
+    moved_users = {}
+    leaving = {}
+    for team_data in teams_data:
+        team_id = team_ids[team_data['name']]
+        for user_data in team_data['users']:
+            email = user_data['email']
+            if email in found and found[email][0] == shard:
+                moved_users[found[email][1]] = team_id
+            elif email in found:
+                user_shard, user_id, username = found[email]
+                leaving.setdefault(user_shard, set()).add(user_id)
+                new_users[email] = {'username': username, 'email': email, 'team_id': team_id}
+            else:
+                new_users[email] = {'username': user_data['username'], 'email': email, 'team_id': team_id}
+    for user_shard, user_ids in leaving.items():
+        with shards.use(user_shard):
+            db.session.execute(db.delete(User).where(User.id.in_(user_ids)))
+    if new_users:
+        db.session.execute(db.insert(User), list(new_users.values()))
+    if moved_users:
+        db.session.execute(db.update(User), [{'id': user_id, 'team_id': team_id} for user_id, team_id in moved_users.items()])
+
+    return [{
+        'id': team_ids[team_data['name']],
+        'name': team_data['name'],
+        'game_session_id': team_data.get('game_session_id'),
+        'users': [user_data['email'] for user_data in team_data['users']]
+    } for team_data in teams_data]
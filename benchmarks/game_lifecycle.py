@@ -0,0 +1,269 @@
+"""Game lifecycle load test.
+
+Plays full games against the app and reports throughput and p50/p95/p99
+latency per endpoint. Each game creates a session with N teams, then for
+every round runs start-round, concurrent submit-design calls from all the
+teams, score-round and a leaderboard read.
+
+By default the app runs in-process through the Flask test client against a
+fresh SQLite file; --database-url points it at another database (e.g. a
+local Postgres), and --base-url drives an already running server instead.
+
+    python -m benchmarks.game_lifecycle --games 5 --teams 50 --rounds 3
+    python -m benchmarks.game_lifecycle --baseline benchmarks/results/abc1234.json
+
+Results are written as JSON to --output (by default
+benchmarks/results/<commit>.json). With --baseline the run is compared
+against an earlier result and the exit status is 1 when any endpoint's p95
+latency regressed by more than --max-regression.
+"""
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ENDPOINTS = (
+    'create-session',
+    'start-round',
+    'submit-design',
+    'score-round',
+    'leaderboards',
+)
+
+
+class AppClient:
+    # Drives the app in-process through the Flask test client
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, payload=None):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, json=payload)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    # Drives a running server over HTTP
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method, headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+
+class Recorder:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {name: [] for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+
+    def call(self, client, name, method, path, payload=None, expected=(200, 201)):
+        start = time.perf_counter()
+        status, body = client.request(method, path, payload)
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if status not in expected:
+                self.errors[name] += 1
+        return status, body
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    # Nearest-rank percentile
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def seed_cards(client, count):
+    for i in range(count):
+        client.request('POST', '/challenge-cards', {
+            'title': f'Benchmark challenge {i}',
+            'description': 'Design a structure for the benchmark.',
+            'key_considerations': 'Thermal insulation, renewable materials, structural integrity',
+            'bonus_points': 10,
+        })
+        client.request('POST', '/bonus-cards', {
+            'name': f'Benchmark bonus {i}',
+            'effect': 'Rewards recycled materials.',
+            'scoring_rules': 'recycled:10, local:5',
+        })
+
+
+def play_game(client, recorder, executor, game, teams, rounds):
+    status, body = recorder.call(client, 'create-session', 'POST', '/game-sessions', {
+        'name': f'Benchmark game {game}',
+        'number_of_rounds': rounds + 1,
+        'teams': [{'name': f'Benchmark game {game} team {i}'} for i in range(teams)],
+    })
+    if status != 201:
+        return
+    session_id = body['game_session']['id']
+    team_ids = [team['id'] for team in body['game_session']['teams']]
+    design = json.dumps({
+        'materials': ['timber', 'straw', 'recycled glass'],
+        'notes': 'Thermal insulation from renewable materials with local recycled glass.',
+    })
+
+    for _ in range(rounds):
+        status, _ = recorder.call(client, 'start-round', 'POST', f'/game-sessions/{session_id}/start-round')
+        if status != 201:
+            return
+        submissions = [
+            executor.submit(
+                recorder.call, client, 'submit-design', 'PUT', f'/game-sessions/{session_id}/submit-design',
+                {'team_id': team_id, 'design_data': design}
+            )
+            for team_id in team_ids
+        ]
+        for future in submissions:
+            future.result()
+        recorder.call(client, 'score-round', 'POST', f'/game-sessions/{session_id}/score-round')
+        recorder.call(client, 'leaderboards', 'GET', f'/leaderboards?game_session_id={session_id}&limit=10')
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_benchmark(client, games=3, teams=20, rounds=3, concurrency=8, cards=10):
+    seed_cards(client, cards)
+    recorder = Recorder()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for game in range(games):
+            play_game(client, recorder, executor, game, teams, rounds)
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name in ENDPOINTS:
+        latencies = recorder.latencies[name]
+        endpoints[name] = {
+            'requests': len(latencies),
+            'errors': recorder.errors[name],
+            'throughput': len(latencies) / elapsed if elapsed else None,
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+        }
+    return {
+        'commit': current_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'config': {'games': games, 'teams': teams, 'rounds': rounds, 'concurrency': concurrency},
+        'elapsed_seconds': elapsed,
+        'games_per_second': games / elapsed if elapsed else None,
+        'endpoints': endpoints,
+    }
+
+
+def compare(result, baseline, max_regression):
+    # Print p95 changes against the baseline and return the regressed endpoints
+    regressed = []
+    print(f"{'endpoint':<16}{'baseline p95':>14}{'p95':>12}{'change':>10}")
+    for name, stats in result['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name, {}).get('p95')
+        after = stats['p95']
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        print(f'{name:<16}{before * 1000:>12.1f}ms{after * 1000:>10.1f}ms{change:>+10.0%}')
+        if change > max_regression:
+            regressed.append(name)
+    return regressed
+
+
+def print_report(result):
+    print(f"{result['config']} in {result['elapsed_seconds']:.2f}s at commit {result['commit']}")
+    print(f"{'endpoint':<16}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, stats in result['endpoints'].items():
+        if not stats['requests']:
+            continue
+        print(
+            f"{name:<16}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput']:>10.1f}"
+            f"{stats['p50'] * 1000:>8.1f}ms{stats['p95'] * 1000:>8.1f}ms{stats['p99'] * 1000:>8.1f}ms"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--games', type=int, default=3)
+    parser.add_argument('--teams', type=int, default=20, help='teams per game session')
+    parser.add_argument('--rounds', type=int, default=3, help='rounds played per game')
+    parser.add_argument('--concurrency', type=int, default=8, help='parallel submit-design requests')
+    parser.add_argument('--cards', type=int, default=10, help='challenge and bonus cards to seed')
+    parser.add_argument('--database-url', help='database for the in-process app (default: a new SQLite file)')
+    parser.add_argument('--base-url', help='benchmark a running server instead of the in-process app')
+    parser.add_argument('--submission-batching', action='store_true',
+                        help='group-commit submit-design requests in the in-process app')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--baseline', help='earlier result file to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='allowed p95 increase, as a fraction')
+    args = parser.parse_args(argv)
+
+    if args.base_url:
+        client = HttpClient(args.base_url)
+    else:
+        from app import create_app, db
+        from config import Config
+
+        class BenchmarkConfig(Config):
+            SQLALCHEMY_DATABASE_URI = args.database_url or 'sqlite:///' + os.path.join(
+                tempfile.mkdtemp(prefix='material-mastery-bench-'), 'bench.db'
+            )
+            SCORING_JOB_WORKERS = 0
+            SUBMISSION_BATCHING = args.submission_batching
+
+        app = create_app(BenchmarkConfig)
+        with app.app_context():
+            db.create_all()
+        client = AppClient(app)
+
+    result = run_benchmark(client, args.games, args.teams, args.rounds, args.concurrency, args.cards)
+    print_report(result)
+
+    output = args.output or os.path.join(os.path.dirname(__file__), 'results', f"{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f'Results written to {output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressed = compare(result, json.load(f), args.max_regression)
+        if regressed:
+            print(f"p95 regressed by more than {args.max_regression:.0%}: {', '.join(regressed)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,6 +3,103 @@ from dotenv import load_dotenv
 
 load_dotenv()  # Load environment variables from the .env file
 
+
+def bind_urls(prefix, variable):
+    # Bind keys and URLs for the comma-separated database URLs in an
+    # environment variable, in order: {'<prefix>_0': url, ...}
+    urls = [url.strip() for url in os.getenv(variable, '').split(',') if url.strip()]
+    return {f'{prefix}_{i}': url for i, url in enumerate(urls)}
+
+
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')  # Use the DATABASE_URL from the .env file
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Extra databases, comma separated in REPLICA_DATABASE_URLS and
+    # SHARD_DATABASE_URLS, configured as binds named replica_0, shard_0, ...
+    SQLALCHEMY_BINDS = {**bind_urls('replica', 'REPLICA_DATABASE_URLS'), **bind_urls('shard', 'SHARD_DATABASE_URLS')}
+
+    # Read replicas of the primary database. GET requests read from a
+    # healthy replica, which is checked at most every
+    # REPLICA_HEALTH_CHECK_INTERVAL seconds.
+    REPLICA_BINDS = tuple(bind_urls('replica', 'REPLICA_DATABASE_URLS'))
+    REPLICA_HEALTH_CHECK_INTERVAL = 5
+
+    # Game sessions with their teams, users, rounds, submissions and scoring
+    # jobs are spread over the shard databases, while the cards stay in
+    # DATABASE_URL. Shard i holds the ids that leave remainder i when
+    # divided by SHARD_ID_STRIDE, the most shards there can be. Every shard
+    # needs the full schema, so run the migrations against each one with
+    # `DATABASE_URL=<shard url> flask db upgrade`, then `flask init-shards`
+    # once to set the id sequences of PostgreSQL shards. Rounds refer to
+    # their cards by plain id, so the card tables stay empty on the shards.
+    SHARD_BINDS = tuple(bind_urls('shard', 'SHARD_DATABASE_URLS'))
+    SHARD_ID_STRIDE = 64
+
+    # Record request latency and SQL statistics and serve them on /metrics
+    METRICS_ENABLED = True
+
+    # Page size limits for the keyset-paginated card catalogs
+    CATALOG_PAGE_SIZE = 100
+    CATALOG_MAX_PAGE_SIZE = 1000
+
+    # Seconds an in-memory card deck snapshot is trusted before reloading
+    CARD_DECK_TTL = 60
+
+    # Seconds a cached catalog response is served before it is rebuilt, and
+    # the number of cached responses (pages) and their total size in bytes
+    # kept per catalog
+    CATALOG_CACHE_TTL = 60
+    CATALOG_CACHE_MAX_ENTRIES = 256
+    CATALOG_CACHE_MAX_BYTES = 16 * 1024 * 1024
+
+    # Names of the registered scoring rule sets to apply; None applies all
+    SCORING_RULE_SETS = None
+
+    # Process pool size for background scoring jobs (None = one per CPU,
+    # 0 = score in the job's coordinator thread) and submissions per chunk
+    SCORING_JOB_WORKERS = None
+    SCORING_JOB_CHUNK_SIZE = 500
+
+    # Leaderboard page sizes, and seconds before the in-memory rankings are
+    # reloaded to pick up scores written by other processes
+    LEADERBOARD_PAGE_SIZE = 100
+    LEADERBOARD_MAX_PAGE_SIZE = 1000
+    LEADERBOARD_TTL = 30
+
+    # Seconds between keepalive comments on the game session event streams,
+    # and events buffered per client before newer ones are dropped
+    SSE_KEEPALIVE = 15
+    SSE_QUEUE_SIZE = 100
+
+    # Group-commit submit-design: submissions are collected for up to
+    # SUBMISSION_BATCH_WINDOW seconds (or SUBMISSION_BATCH_SIZE of them) and
+    # inserted together, validated against a session view cached for
+    # SUBMISSION_VIEW_TTL seconds. Requests give up on their batch after
+    # SUBMISSION_BATCH_TIMEOUT seconds.
+    SUBMISSION_BATCHING = False
+    SUBMISSION_BATCH_WINDOW = 0.01
+    SUBMISSION_BATCH_SIZE = 500
+    SUBMISSION_VIEW_TTL = 5
+    SUBMISSION_BATCH_TIMEOUT = 30
+
+    # Valid rows inserted per batch and commit by the card imports, the
+    # number of invalid rows reported back, and the longest CSV field read
+    CARD_IMPORT_BATCH_SIZE = 5000
+    CARD_IMPORT_MAX_ERRORS = 1000
+    CARD_IMPORT_MAX_FIELD_SIZE = 16 * 1024 * 1024
+
+    # Rows fetched per server-side cursor chunk by the game history export
+    HISTORY_EXPORT_CHUNK_SIZE = 1000
+
+    # Seconds a cached game session snapshot is served before it is rebuilt,
+    # and the number of sessions kept
+    SESSION_SNAPSHOT_TTL = 30
+    SESSION_SNAPSHOT_MAX_ENTRIES = 1024
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_BINDS = {}
+    REPLICA_BINDS = ()
+    SHARD_BINDS = ()
@@ -0,0 +1,80 @@
+"""Store DesignSubmission.design_data zlib-compressed
+
+Revision ID: 3a8d2c6e9b14
+Revises: f19b64c8e3a5
+Create Date: 2026-10-18 15:22:47.610318
+
+Existing designs are copied into a binary column in batches of BATCH_SIZE
+rows, compressing them in Python, so only one batch is held in memory at a
+time. The conversion reads the table and so cannot be rendered with --sql.
+
+"""
+import zlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a8d2c6e9b14'
+down_revision = 'f19b64c8e3a5'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 1000
+
+
+def convert(source, target, transform):
+    # Copy design_submission.<source> into <target> in id order, one batch
+    # of rows per SELECT and executemany UPDATE
+    if op.get_context().as_sql:
+        raise RuntimeError('Converting design_data needs a database connection; run it without --sql.')
+    submissions = sa.table(
+        'design_submission',
+        sa.column('id', sa.Integer),
+        sa.column(source, sa.LargeBinary if source == 'design_blob' else sa.Text),
+        sa.column(target, sa.LargeBinary if target == 'design_blob' else sa.Text),
+    )
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(submissions.c.id, submissions.c[source])
+            .where(submissions.c.id > last_id)
+            .order_by(submissions.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            submissions.update().where(submissions.c.id == sa.bindparam('row_id')),
+            [{'row_id': row_id, target: transform(value)} for row_id, value in rows]
+        )
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    with op.batch_alter_table('design_submission', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('design_blob', sa.LargeBinary(), nullable=True))
+
+    convert('design_data', 'design_blob', lambda value: zlib.compress(value.encode('utf-8')))
+
+    with op.batch_alter_table('design_submission', schema=None) as batch_op:
+        batch_op.drop_column('design_data')
+        batch_op.alter_column('design_blob', new_column_name='design_data',
+                              existing_type=sa.LargeBinary(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('design_submission', schema=None) as batch_op:
+        batch_op.alter_column('design_data', new_column_name='design_blob',
+                              existing_type=sa.LargeBinary(), nullable=True)
+    with op.batch_alter_table('design_submission', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('design_data', sa.Text(), nullable=True))
+
+    convert('design_blob', 'design_data', lambda value: zlib.decompress(value).decode('utf-8'))
+
+    with op.batch_alter_table('design_submission', schema=None) as batch_op:
+        batch_op.drop_column('design_blob')
+        batch_op.alter_column('design_data', existing_type=sa.Text(), nullable=False)
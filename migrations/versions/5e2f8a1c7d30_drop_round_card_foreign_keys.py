@@ -0,0 +1,54 @@
+"""Drop the foreign keys from Round to the card catalogs
+
+Rounds live on their game session's shard while the cards stay in the
+catalog database, so a round's card ids can't reference the card tables.
+
+Revision ID: 5e2f8a1c7d30
+Revises: 7c1e4b2d9f63
+Create Date: 2026-10-18 19:02:17.644203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2f8a1c7d30'
+down_revision = '7c1e4b2d9f63'
+branch_labels = None
+depends_on = None
+
+CARD_FOREIGN_KEYS = (
+    ('round_challenge_card_id_fkey', 'challenge_card', 'challenge_card_id'),
+    ('round_bonus_card_id_fkey', 'bonus_card', 'bonus_card_id'),
+)
+
+
+def round_table():
+    # The round table without its card foreign keys
+    return sa.Table('round', sa.MetaData(),
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('round_number', sa.Integer(), nullable=False),
+        sa.Column('game_session_id', sa.Integer(), sa.ForeignKey('game_session.id'), nullable=True),
+        sa.Column('challenge_card_id', sa.Integer(), nullable=True),
+        sa.Column('bonus_card_id', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.Index('ix_round_game_session_id_round_number', 'game_session_id', 'round_number'),
+    )
+
+
+def upgrade():
+    if op.get_context().dialect.name == 'sqlite':
+        # SQLite's foreign keys have no names to drop them by, so the table
+        # is rebuilt from a definition without them
+        with op.batch_alter_table('round', copy_from=round_table(), recreate='always'):
+            pass
+    else:
+        for name, _, _ in CARD_FOREIGN_KEYS:
+            op.drop_constraint(name, 'round', type_='foreignkey')
+
+
+def downgrade():
+    with op.batch_alter_table('round', schema=None) as batch_op:
+        for name, table, column in CARD_FOREIGN_KEYS:
+            batch_op.create_foreign_key(name, table, [column], ['id'])
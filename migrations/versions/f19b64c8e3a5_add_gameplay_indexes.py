@@ -0,0 +1,66 @@
+"""Add gameplay indexes and unique submission per team and round
+
+Revision ID: f19b64c8e3a5
+Revises: c5a09e7d13b8
+Create Date: 2026-10-18 12:41:08.395720
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY outside
+the migration transaction, so writers are not blocked while they build, and
+the unique constraint is attached to its prebuilt index. A failed concurrent
+build leaves an INVALID index behind that has to be dropped before retrying.
+The unique constraint fails to build while duplicate (team_id, round_id)
+submissions exist.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f19b64c8e3a5'
+down_revision = 'c5a09e7d13b8'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_round_game_session_id_round_number', 'round', ['game_session_id', 'round_number']),
+    ('ix_design_submission_round_id_team_id', 'design_submission', ['round_id', 'team_id']),
+    ('ix_team_game_session_id', 'team', ['game_session_id']),
+    ('ix_team_name', 'team', ['name']),
+]
+
+UNIQUE_SUBMISSION = 'uq_design_submission_team_id_round_id'
+
+
+def upgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+            op.create_index(UNIQUE_SUBMISSION, 'design_submission', ['team_id', 'round_id'], unique=True,
+                            postgresql_concurrently=True, if_not_exists=True)
+            op.execute(
+                f'ALTER TABLE design_submission ADD CONSTRAINT {UNIQUE_SUBMISSION} '
+                f'UNIQUE USING INDEX {UNIQUE_SUBMISSION}'
+            )
+        return
+
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+    with op.batch_alter_table('design_submission', schema=None) as batch_op:
+        batch_op.create_unique_constraint(UNIQUE_SUBMISSION, ['team_id', 'round_id'])
+
+
+def downgrade():
+    if op.get_context().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.drop_constraint(UNIQUE_SUBMISSION, 'design_submission', type_='unique')
+            for name, table, columns in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        return
+
+    with op.batch_alter_table('design_submission', schema=None) as batch_op:
+        batch_op.drop_constraint(UNIQUE_SUBMISSION, type_='unique')
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,37 @@
+import unittest
+from contextlib import contextmanager
+from sqlalchemy import event
+from app import create_app, db
+from app.jobs import jobs
+from app.submissions import submission_batcher
+from config import TestConfig
+
+
+class AppTestCase(unittest.TestCase):
+    # Runs the app on the in-memory test database with the full schema.
+    # capture_queries() collects the SQL statements run inside it.
+
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        jobs.shutdown(self.app)
+        submission_batcher.shutdown(self.app)
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    @contextmanager
+    def capture_queries(self):
+        statements = []
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from app.jobs import jobs
+from app.submissions import submission_batcher
+from config import TestConfig
+
+
+class FileDatabaseTestCase(unittest.TestCase):
+    # Runs the app on SQLite files in a temporary directory: default.db for
+    # the default database and one file per name in `binds`, each with the
+    # full schema. settings() adds to the test config.
+
+    binds = ()
+
+    def settings(self):
+        return {}
+
+    def path(self, name):
+        return os.path.join(self.directory, f'{name}.db')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        config = type('FileDatabaseConfig', (TestConfig,), {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + self.path('default'),
+            'SQLALCHEMY_BINDS': {name: 'sqlite:///' + self.path(name) for name in self.binds},
+            **self.settings(),
+        })
+
+        self.app = create_app(config)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        for engine in db.engines.values():
+            # Enforce foreign keys, as PostgreSQL does
+            event.listen(engine, 'connect', lambda connection, record: connection.execute('PRAGMA foreign_keys=ON'))
+            db.metadata.create_all(bind=engine)
+
+    def tearDown(self):
+        jobs.shutdown(self.app)
+        submission_batcher.shutdown(self.app)
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+        self.app_context.pop()
+        # Flask-SQLAlchemy keeps a metadata per bind key on the shared db
+        for name in self.binds:
+            db.metadatas.pop(name, None)
+        shutil.rmtree(self.directory)
@@ -0,0 +1,19 @@
+import unittest
+from benchmarks.game_lifecycle import AppClient, ENDPOINTS, compare, run_benchmark
+from app_database import AppTestCase
+
+class GameLifecycleBenchmarkTestCase(AppTestCase):
+
+    def test_benchmark_plays_games_without_errors(self):
+        result = run_benchmark(AppClient(self.app), games=1, teams=3, rounds=2, concurrency=1, cards=2)
+        self.assertEqual(set(result['endpoints']), set(ENDPOINTS))
+        self.assertEqual(result['endpoints']['submit-design']['requests'], 6)
+        self.assertEqual(sum(stats['errors'] for stats in result['endpoints'].values()), 0)
+
+        slower = {'endpoints': {name: dict(stats, p95=stats['p95'] * 2) for name, stats in result['endpoints'].items()}}
+        self.assertEqual(compare(slower, result, 0.5), list(ENDPOINTS))
+        self.assertEqual(compare(result, slower, 0.5), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from app import db
+from app.catalog_cache import catalog_cache
+from app.decks import decks
+from app.leaderboard import leaderboards
+from app.snapshots import snapshots
+from app.models import ChallengeCard, BonusCard, MaterialCard, User
+from app_database import AppTestCase
+
+# Every endpoint runs against a small and a large data set with the
+# in-memory caches cleared. Each must stay within its budget and execute
+# the same number of statements at both sizes.
+SMALL = 2
+LARGE = 30
+
+# (name, method, path, payload, budget). Paths and payloads are built from
+# the data set so each request targets the game session created for it.
+BUDGETS = [
+    ('list teams', 'get', lambda d: '/teams', None, 2),
+    ('read game session', 'get', lambda d: f"/game-sessions/{d['session_id']}", None, 5),
+    ('session snapshot', 'get', lambda d: f"/game-sessions/{d['session_id']}/snapshot", None, 7),
+    ('update game session', 'put', lambda d: f"/game-sessions/{d['session_id']}",
+     lambda d: {'current_round': 2, 'teams': [{'id': team_id, 'score': 5} for team_id in d['team_ids']]}, 4),
+    ('start round', 'post', lambda d: f"/game-sessions/{d['session_id']}/start-round", None, 6),
+    ('submit design', 'put', lambda d: f"/game-sessions/{d['session_id']}/submit-design",
+     lambda d: {'team_id': d['late_team_id'], 'design_data': 'A recycled timber frame.'}, 4),
+    ('round results', 'get', lambda d: f"/game-sessions/{d['session_id']}/round-results", None, 3),
+    ('round results summary', 'get', lambda d: f"/game-sessions/{d['session_id']}/round-results?view=summary", None, 3),
+    ('submission design', 'get', lambda d: f"/game-sessions/{d['session_id']}/submissions/{d['submission_id']}", None, 1),
+    ('score round', 'post', lambda d: f"/game-sessions/{d['session_id']}/score-round", None, 7),
+    ('leaderboards', 'get', lambda d: f"/leaderboards?game_session_id={d['session_id']}", None, 1),
+    ('create team', 'post', lambda d: '/teams',
+     lambda d: {'name': f"New team {d['size']}", 'users': [
+         {'email': email} for email in d['emails'][:4]] + [{'username': f"new{d['size']}", 'email': f"new{d['size']}@example.com"}]}, 5),
+    ('register teams in bulk', 'post', lambda d: '/teams/bulk',
+     lambda d: {'teams': [{'name': f"Bulk {d['size']} {i}", 'users': [
+         {'username': f"bulk{d['size']}-{i}-{j}", 'email': f"bulk{d['size']}-{i}-{j}@example.com"} for j in range(3)]}
+         for i in range(d['size'])]}, 4),
+    ('material cards', 'get', lambda d: '/material-cards?limit=10', None, 1),
+    ('challenge cards', 'get', lambda d: '/challenge-cards?limit=10', None, 1),
+    ('bonus cards', 'get', lambda d: '/bonus-cards?limit=10', None, 1),
+]
+
+
+class QueryBudgetTestCase(AppTestCase):
+
+    def populate(self, size):
+        # A game session with `size` teams of two users each, a started
+        # round with designs from every team but one, and `size` cards of
+        # every kind
+        db.session.add_all([MaterialCard(name=f'Material {size}-{i}', properties='Dense', uses='Walls') for i in range(size)])
+        db.session.add_all([ChallengeCard(title=f'Challenge {size}-{i}', description='Build it.',
+                                          key_considerations='Thermal insulation', bonus_points=5) for i in range(size)])
+        db.session.add_all([BonusCard(name=f'Bonus {size}-{i}', effect='Points', scoring_rules='recycled:10') for i in range(size)])
+        db.session.commit()
+        decks.invalidate()
+
+        response = self.client.post('/game-sessions', json={
+            'name': f'Session {size}', 'number_of_rounds': 5,
+            'teams': [{'name': f'Team {size}-{i}'} for i in range(size + 1)]
+        })
+        game_session = response.get_json()['game_session']
+        team_ids = [team['id'] for team in game_session['teams']]
+        emails = []
+        for team_id in team_ids:
+            for i in range(2):
+                emails.append(f'user{team_id}-{i}@example.com')
+                db.session.add(User(username=f'user{team_id}-{i}', email=emails[-1], team_id=team_id))
+        db.session.commit()
+
+        self.client.post(f"/game-sessions/{game_session['id']}/start-round")
+        for team_id in team_ids[:-1]:
+            response = self.client.put(f"/game-sessions/{game_session['id']}/submit-design", json={
+                'team_id': team_id, 'design_data': 'Recycled timber with thermal insulation.'
+            })
+        return {
+            'size': size,
+            'session_id': game_session['id'],
+            'team_ids': team_ids,
+            'late_team_id': team_ids[-1],
+            'submission_id': response.get_json()['submission']['id'],
+            'emails': emails,
+        }
+
+    def clear_caches(self):
+        decks.invalidate()
+        leaderboards.invalidate()
+        snapshots.invalidate()
+        for catalog in ('material', 'challenge', 'bonus'):
+            catalog_cache.bump(catalog)
+
+    def measure(self, method, path, payload):
+        self.clear_caches()
+        with self.capture_queries() as statements:
+            response = getattr(self.client, method)(path, json=payload)
+        self.assertLess(response.status_code, 300, response.get_data(as_text=True))
+        return len(statements)
+
+    def test_endpoints_stay_within_query_budgets(self):
+        data_sets = [self.populate(SMALL), self.populate(LARGE)]
+        for name, method, path, payload, budget in BUDGETS:
+            with self.subTest(endpoint=name):
+                counts = [
+                    self.measure(method, path(data), payload(data) if payload else None)
+                    for data in data_sets
+                ]
+                self.assertLessEqual(max(counts), budget, f'{name} ran {counts} statements, budget is {budget}')
+                self.assertEqual(counts[0], counts[1], f'{name} statement count grows with data size: {counts}')
+
+
+if __name__ == '__main__':
+    unittest.main()
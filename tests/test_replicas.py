@@ -0,0 +1,77 @@
+import os
+import unittest
+from app import db
+from app.models import MaterialCard, Team
+from file_databases import FileDatabaseTestCase
+
+
+class ReplicaTestCase(FileDatabaseTestCase):
+    # The default database stands in for the primary. Nothing replicates
+    # between the files, so each read shows which database served it.
+
+    binds = ('replica',)
+
+    def settings(self):
+        return {'REPLICA_BINDS': self.binds}
+
+    def setUp(self):
+        super().setUp()
+        for name in (None,) + self.binds:
+            with db.engines[name].begin() as connection:
+                connection.execute(db.insert(MaterialCard).values(name=f'{name or "primary"} card', properties='Dense', uses='Walls'))
+                connection.execute(db.insert(Team).values(name=f'{name or "primary"} team'))
+
+    def team_names(self):
+        return [team['name'] for team in self.client.get('/teams').get_json()]
+
+    def card_names(self):
+        return [card['name'] for card in self.client.get('/material-cards?limit=10').get_json()['items']]
+
+
+class ReadReplicaTestCase(ReplicaTestCase):
+
+    def test_get_requests_read_from_the_replica(self):
+        self.assertEqual(self.team_names(), ['replica team'])
+
+        response = self.client.post('/teams', json={'name': 'Straw', 'users': [{'username': 'ada', 'email': 'ada@example.com'}]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([team.name for team in Team.query.all()], ['primary team', 'Straw'])
+        self.assertEqual(self.team_names(), ['replica team'])
+
+    def test_caches_fill_from_the_primary(self):
+        # The replica never sees the new card, but the cache is versioned by
+        # writes to the primary, so it must not keep the replica's page
+        self.assertEqual(self.card_names(), ['primary card'])
+        response = self.client.post('/material-cards', json={'name': 'Straw', 'properties': 'Light', 'uses': 'Insulation'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.card_names(), ['primary card', 'Straw'])
+        self.assertEqual(self.card_names(), ['primary card', 'Straw'])
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        with self.app.test_request_context('/material-cards'):
+            self.assertEqual(db.session.scalars(db.select(MaterialCard.name)).all(), ['replica card'])
+            db.session.add(MaterialCard(name='Straw', properties='Light', uses='Insulation'))
+            db.session.flush()
+            self.assertEqual(db.session.scalars(db.select(MaterialCard.name)).all(), ['primary card', 'Straw'])
+            db.session.rollback()
+
+
+class UnhealthyReplicaTestCase(ReplicaTestCase):
+
+    binds = ('broken', 'replica')
+
+    def test_reads_skip_an_unhealthy_replica(self):
+        os.remove(self.path('broken'))
+        os.mkdir(self.path('broken'))
+        db.engines['broken'].dispose()
+        self.assertEqual({tuple(self.team_names()) for _ in range(4)}, {('replica team',)})
+
+        os.remove(self.path('replica'))
+        os.mkdir(self.path('replica'))
+        db.engines['replica'].dispose()
+        self.app.extensions['replicas']['health'].clear()
+        self.assertEqual(self.team_names(), ['primary team'])
+
+
+if __name__ == '__main__':
+    unittest.main()
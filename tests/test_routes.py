@@ -1,168 +1,899 @@
+import csv
+import io
+import json
+import os
+import tempfile
 import unittest
-from app import create_app, db
-from app.models import MaterialCard
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event
+from app import db
+from app.models import MaterialCard, ChallengeCard, BonusCard
+from app.models import Team, User, Round, DesignSubmission
+from app.decks import decks
+from app.jobs import jobs
+from app.leaderboard import leaderboards
+from app.submissions import insert_submissions, submission_batcher
+from app.teams import create_teams
+from app_database import AppTestCase
 
-class MaterialCardTestCase(unittest.TestCase):
 
-    def setUp(self):
-        self.app = create_app()
-        self.app.config['TESTING'] = True
-        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-        self.client = self.app.test_client()
-        with self.app.app_context():
-            db.create_all()
-
-    def tearDown(self):
-        with self.app.app_context():
-            db.session.remove()
-            db.drop_all()
+class MaterialCardTestCase(AppTestCase):
 
     def test_get_material_cards(self):
         response = self.client.get('/material-cards')
         self.assertEqual(response.status_code, 200)
 
+    def test_create_team(self):
+        response = self.client.post('/teams', json={
+            "name": "Team Alpha",
+            "users": [
+                {"username": "user1", "email": "user1@example.com"},
+                {"username": "user2", "email": "user2@example.com"}
+            ]
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('Team created successfully!', str(response.data))
+
+        # Test for team name required
+        response = self.client.post('/teams', json={
+            "users": [
+                {"username": "user1", "email": "user1@example.com"},
+                {"username": "user2", "email": "user2@example.com"}
+            ]
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Team name is required', str(response.data))
+
+        # Test for user limit
+        response = self.client.post('/teams', json={
+            "name": "Team Beta",
+            "users": [
+                {"username": "user1", "email": "user1@example.com"},
+                {"username": "user2", "email": "user2@example.com"},
+                {"username": "user3", "email": "user3@example.com"},
+                {"username": "user4", "email": "user4@example.com"},
+                {"username": "user5", "email": "user5@example.com"},
+                {"username": "user6", "email": "user6@example.com"}
+            ]
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('A team cannot have more than 5 users', str(response.data))
+
+    def test_get_all_teams(self):
+        # Create a couple of teams for testing
+        team1 = Team(name='Team Alpha')
+        team2 = Team(name='Team Beta')
+        user1 = User(username='user1', email='user1@example.com', team=team1)
+        user2 = User(username='user2', email='user2@example.com', team=team1)
+        user3 = User(username='user3', email='user3@example.com', team=team2)
+        user4 = User(username='user4', email='user4@example.com', team=team2)
+
+        db.session.add_all([team1, team2, user1, user2, user3, user4])
+        db.session.commit()
+
+        response = self.client.get('/teams')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+
+        # Verify the response data structure
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data[0]['name'], 'Team Alpha')
+        self.assertEqual(len(data[0]['users']), 2)
+        self.assertEqual(data[1]['name'], 'Team Beta')
+        self.assertEqual(len(data[1]['users']), 2)
+
+    def test_update_material_card(self):
+        # Create a material card for testing
+        material_card = MaterialCard(name='Concrete', properties='High strength', uses='Buildings')
+        db.session.add(material_card)
+        db.session.commit()
+
+        # Update the material card
+        response = self.client.put(f'/material-cards/{material_card.id}', json={
+            "name": "Updated Concrete",
+            "properties": "Improved compressive strength, better durability",
+            "uses": "Foundations, high-rise buildings"
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Material card updated successfully!', str(response.data))
+
+        # Verify the updated values
+        updated_material_card = MaterialCard.query.get(material_card.id)
+        self.assertEqual(updated_material_card.name, "Updated Concrete")
+        self.assertEqual(updated_material_card.properties, "Improved compressive strength, better durability")
+        self.assertEqual(updated_material_card.uses, "Foundations, high-rise buildings")
+
+
+    def test_delete_material_card(self):
+        # Create a material card for testing
+        material_card = MaterialCard(name='Concrete', properties='High strength', uses='Buildings')
+        db.session.add(material_card)
+        db.session.commit()
+
+        # Delete the material card
+        response = self.client.delete(f'/material-cards/{material_card.id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'Material card with ID {material_card.id} deleted successfully!', str(response.data))
+
+        # Verify the material card has been deleted
+        deleted_material_card = MaterialCard.query.get(material_card.id)
+        self.assertIsNone(deleted_material_card)
+
+
+    def test_get_challenge_cards(self):
+        # Add a couple of challenge cards for testing
+        card1 = ChallengeCard(
+            title="Design a Sustainable Home in a Cold Climate",
+            description="Create a design for a residential home that prioritizes energy efficiency and sustainability in a cold climate.",
+            key_considerations="Thermal insulation, renewable materials, energy-efficient windows, structural integrity under snow load.",
+            bonus_points=10
+        )
+        card2 = ChallengeCard(
+            title="Create a High-Rise Office Building with Maximum Transparency",
+            description="Design a modern office building that maximizes natural light and offers panoramic views of the city.",
+            key_considerations="Structural support for large glass facades, thermal efficiency, glare reduction, aesthetic appeal.",
+            bonus_points=15
+        )
+
+        db.session.add_all([card1, card2])
+        db.session.commit()
+
+        # Send GET request
+        response = self.client.get('/challenge-cards')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+
+        # Verify the response data structure
+        self.assertEqual(len(data), 2)
+        self.assertEqual(data[0]['title'], 'Design a Sustainable Home in a Cold Climate')
+        self.assertEqual(data[1]['title'], 'Create a High-Rise Office Building with Maximum Transparency')
+
+
+    def test_create_challenge_card(self):
+        response = self.client.post('/challenge-cards', json={
+            "title": "Design a Pavilion for a Tropical Environment",
+            "description": "Create a pavilion that is well-suited for a hot and humid tropical climate, focusing on natural ventilation and protection from the elements.",
+            "key_considerations": "Weather-resistant materials, shading, cross-ventilation, lightweight construction.",
+            "bonus_points": 8
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('Challenge card created successfully!', str(response.data))
+
+        # Verify the challenge card was added to the database
+        card = ChallengeCard.query.filter_by(title="Design a Pavilion for a Tropical Environment").first()
+        self.assertIsNotNone(card)
+        self.assertEqual(card.description, "Create a pavilion that is well-suited for a hot and humid tropical climate, focusing on natural ventilation and protection from the elements.")
+        self.assertEqual(card.key_considerations, "Weather-resistant materials, shading, cross-ventilation, lightweight construction.")
+        self.assertEqual(card.bonus_points, 8)
+
+
+    def test_material_cards_keyset_pagination(self):
+        db.session.add_all([
+            MaterialCard(name=f'Material {i}', properties='Dense', uses='Walls')
+            for i in range(5)
+        ])
+        db.session.commit()
+
+        response = self.client.get('/material-cards?limit=2')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual([item['name'] for item in data['items']], ['Material 0', 'Material 1'])
+        self.assertEqual(data['next_cursor'], data['items'][-1]['id'])
+
+        names = []
+        cursor = 0
+        while cursor is not None:
+            data = self.client.get(f'/material-cards?limit=2&after={cursor}').get_json()
+            names.extend(item['name'] for item in data['items'])
+            cursor = data['next_cursor']
+        self.assertEqual(names, [f'Material {i}' for i in range(5)])
+
+    def test_card_catalog_field_projection(self):
+        db.session.add(BonusCard(name='Recycler', effect='Double points', scoring_rules='recycled:10'))
+        db.session.commit()
+
+        response = self.client.get('/bonus-cards?fields=name')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(set(data['items'][0]), {'id', 'name'})
+        self.assertIsNone(data['next_cursor'])
+
+        response = self.client.get('/challenge-cards?fields=title,secret')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get('/challenge-cards?limit=0')
+        self.assertEqual(response.status_code, 400)
+
+
+    def test_card_catalog_conditional_get(self):
+        self.client.post('/challenge-cards', json={'title': 'Pavilion', 'description': 'Keep it cool.'})
+        first = self.client.get('/challenge-cards')
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.headers['ETag'])
+
+        with self.capture_queries() as statements:
+            cached = self.client.get('/challenge-cards')
+            revalidated = self.client.get('/challenge-cards', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(statements, [])
+        self.assertEqual(cached.data, first.data)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated.data, b'')
+
+        self.client.post('/challenge-cards', json={'title': 'Bridge', 'description': 'Span the river.'})
+        changed = self.client.get('/challenge-cards', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.get_json()), 2)
+        self.assertNotEqual(changed.headers['ETag'], first.headers['ETag'])
+
+    def test_card_catalog_cache_keys_and_budget(self):
+        db.session.add_all([MaterialCard(name=f'Material {i}', properties='Dense', uses='Walls') for i in range(5)])
+        db.session.commit()
+        first = self.client.get('/material-cards?limit=2&fields=name')
+
+        # Spellings of the same page share one entry; bad arguments get no entry
+        with self.capture_queries() as statements:
+            for path in ('/material-cards?fields=id,name&limit=2&after=0', '/material-cards?limit=02&fields=name&page=9'):
+                self.assertEqual(self.client.get(path).data, first.data)
+        self.assertEqual(statements, [])
+        self.assertEqual(self.client.get('/material-cards?fields=secret').status_code, 400)
+        entries = self.app.extensions['catalog_cache']['entries']['material']
+        self.assertEqual(len(entries), 1)
+
+        # Pages past the byte budget push out the oldest ones
+        self.app.config['CATALOG_CACHE_MAX_BYTES'] = 2 * len(first.data)
+        for after in range(3):
+            self.client.get(f'/material-cards?limit=2&fields=name&after={after}')
+        self.assertEqual([key[1][1] for key in entries], [1, 2])
+        self.assertLessEqual(self.app.extensions['catalog_cache']['sizes']['material'], 2 * len(first.data))
+
+
+class CardImportTestCase(AppTestCase):
+
+    def test_import_ndjson_in_batches_with_row_errors(self):
+        self.app.config['CARD_IMPORT_BATCH_SIZE'] = 2
+        self.assertEqual(self.client.get('/material-cards').get_json(), [])
+        lines = [json.dumps({'name': f'Timber {i}', 'properties': 'Light', 'uses': 'Frames'}) for i in range(5)]
+        lines[1] = '{"name": "Broken"'
+        lines[3] = json.dumps({'name': 'Straw', 'properties': 'Insulating'})
+        body = '\n'.join(lines) + '\n\n' + json.dumps(['not', 'an', 'object']) + '\n'
+
+        response = self.client.post('/material-cards/import', data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual((data['inserted'], data['failed']), (3, 3))
+        self.assertEqual([error['line'] for error in data['errors']], [2, 4, 7])
+        self.assertEqual(data['errors'][1]['error'], 'uses is required')
+        self.assertEqual(self.client.get('/material-cards').get_json(), ['Timber 0', 'Timber 2', 'Timber 4'])
+
+    def test_import_csv(self):
+        body = 'title,description,key_considerations,bonus_points\n' \
+               'Cold Climate Home,Insulate it.,Thermal insulation,10\n' \
+               '"Flood House","Raise it,\nthen seal it.",,\n' \
+               'Bad Points,Build it.,,many\n'
+        response = self.client.post('/challenge-cards/import', data=body, content_type='text/csv')
+        data = response.get_json()
+        self.assertEqual((data['inserted'], data['failed']), (2, 1))
+        self.assertEqual(data['errors'], [{'line': 5, 'error': 'bonus_points must be an integer'}])
+        cards = ChallengeCard.query.order_by(ChallengeCard.id).all()
+        self.assertEqual([(card.bonus_points, card.key_considerations) for card in cards],
+                         [(10, 'Thermal insulation'), (None, None)])
+        self.assertEqual(cards[1].description, 'Raise it,\nthen seal it.')
+
+        response = self.client.post('/bonus-cards/import', data='{}', content_type='application/json')
+        self.assertEqual(response.status_code, 415)
+
+    def test_import_long_fields_and_bad_encoding(self):
+        self.app.config['CARD_IMPORT_BATCH_SIZE'] = 1
+        self.assertEqual(self.client.get('/material-cards').get_json(), [])
+        properties = 'Dense. ' * 30000
+        body = ('name,properties,uses\n' + ''.join(f'Stone {i},"{properties}",Walls\n' for i in range(2))).encode()
+
+        # Cells past csv's default 128 KiB limit are still valid card texts
+        response = self.client.post('/material-cards/import', data=body, content_type='text/csv')
+        self.assertEqual(response.get_json()['inserted'], 2)
+        self.assertEqual(len(MaterialCard.query.first().properties), len(properties))
+
+        # Batches committed before undecodable input are reported and served
+        response = self.client.post('/material-cards/import', data=body + b'Bad \xff,x,y\n', content_type='text/csv')
+        self.assertEqual(response.status_code, 400)
+        data = response.get_json()
+        self.assertIn('not valid UTF-8', data['error'])
+        self.assertGreater(data['inserted'], 0)
+        self.assertEqual(len(self.client.get('/material-cards').get_json()), 2 + data['inserted'])
+
+    def test_import_cards_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('name,effect,scoring_rules\nRecycler,Double points,recycled:10\nEmpty,,\n')
+        self.addCleanup(os.remove, f.name)
+
+        result = self.app.test_cli_runner().invoke(args=['import-cards', 'bonus', f.name])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('Imported 1 bonus cards, 1 rows failed.', result.output)
+        self.assertEqual([card.name for card in BonusCard.query.all()], ['Recycler'])
+
+
+class CardDeckTestCase(AppTestCase):
+
+    def setUp(self):
+        super().setUp()
+        db.session.add_all([
+            ChallengeCard(title='Cold Climate Home', description='Insulate it.', bonus_points=10),
+            BonusCard(name='Recycler', effect='Double points', scoring_rules='recycled:10'),
+        ])
+        db.session.commit()
+        response = self.client.post('/game-sessions', json={
+            'name': 'Finals', 'number_of_rounds': 5, 'teams': [{'name': 'Team Alpha'}]
+        })
+        self.session_id = response.get_json()['game_session']['id']
+
+    def test_start_round_draws_from_snapshot(self):
+        response = self.client.post(f'/game-sessions/{self.session_id}/start-round')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['round']['challenge_card']['title'], 'Cold Climate Home')
+
+        with self.capture_queries() as statements:
+            response = self.client.post(f'/game-sessions/{self.session_id}/start-round')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse([s for s in statements if 'FROM challenge_card' in s or 'FROM bonus_card' in s])
+
+    def test_card_writes_invalidate_deck(self):
+        self.assertEqual(len(decks.snapshot('challenge')), 1)
+        card_id = self.client.post('/challenge-cards', json={
+            'title': 'Pavilion', 'description': 'Keep it cool.'
+        }).get_json()['id']
+        self.assertEqual(len(decks.snapshot('challenge')), 2)
+
+        self.client.put(f'/challenge-cards/{card_id}', json={'title': 'Tropical Pavilion'})
+        self.assertEqual(decks.snapshot('challenge').get(card_id).title, 'Tropical Pavilion')
+
+        self.client.delete(f'/challenge-cards/{card_id}')
+        self.assertIsNone(decks.snapshot('challenge').get(card_id))
+
+    def test_session_decks_draw_without_replacement(self):
+        db.session.add_all([ChallengeCard(title=f'Challenge {i}', description='Build it.') for i in range(6)])
+        db.session.add_all([BonusCard(name=f'Bonus {i}', effect='None', scoring_rules='none') for i in range(6)])
+        db.session.commit()
+        decks.invalidate()
+
+        def play(seed):
+            response = self.client.post('/game-sessions', json={
+                'name': 'Replay', 'number_of_rounds': 5, 'deck_seed': seed, 'teams': [{'name': 'Team Beta'}]
+            })
+            self.assertEqual(response.get_json()['game_session']['deck_seed'], seed)
+            session_id = response.get_json()['game_session']['id']
+            drawn = []
+            for _ in range(4):
+                response = self.client.post(f'/game-sessions/{session_id}/start-round')
+                self.assertEqual(response.status_code, 201)
+                drawn.append(response.get_json()['round']['challenge_card']['id'])
+            return drawn
+
+        first = play(1234)
+        self.assertEqual(len(set(first)), len(first))
+        self.assertEqual(play(1234), first)
+
+
+class GameplayTestCase(AppTestCase):
+    # A challenge and a bonus card to draw, and play_round() to start a
+    # round in a new session with a design from every team
+
+    def setUp(self):
+        super().setUp()
+        db.session.add_all([
+            ChallengeCard(title='Cold Climate Home', description='Insulate it.', bonus_points=10),
+            BonusCard(name='Recycler', effect='Double points', scoring_rules='recycled:10'),
+        ])
+        db.session.commit()
+
+    def play_round(self, team_count):
+        response = self.client.post('/game-sessions', json={
+            'name': 'League', 'number_of_rounds': 3,
+            'teams': [{'name': f'Team {i}'} for i in range(team_count)]
+        })
+        game_session = response.get_json()['game_session']
+        self.client.post(f"/game-sessions/{game_session['id']}/start-round")
+        for team in game_session['teams']:
+            response = self.client.put(f"/game-sessions/{game_session['id']}/submit-design", json={
+                'team_id': team['id'], 'design_data': 'Recycled timber frame'
+            })
+            self.assertEqual(response.status_code, 201)
+        return game_session
+
+
+class ScoreRoundTestCase(GameplayTestCase):
+
+    def test_score_round_updates_submissions_and_teams(self):
+        game_session = self.play_round(3)
+        response = self.client.post(f"/game-sessions/{game_session['id']}/score-round")
+        self.assertEqual(response.status_code, 200)
+        results = response.get_json()['results']
+        self.assertEqual(len(results), 3)
+
+        scores = {result['team_id']: result['score'] for result in results}
+        for team in Team.query.all():
+            self.assertEqual(team.score, scores[team.id])
+        self.assertEqual(sorted(s.score for s in DesignSubmission.query.all()), sorted(scores.values()))
+
+    def test_score_round_query_count_is_constant(self):
+        counts = []
+        for team_count in (2, 20):
+            game_session = self.play_round(team_count)
+            with self.capture_queries() as statements:
+                response = self.client.post(f"/game-sessions/{game_session['id']}/score-round")
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(statements))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_score_round_async_job(self):
+        self.app.config['SCORING_JOB_WORKERS'] = 2
+        self.app.config['SCORING_JOB_CHUNK_SIZE'] = 2
+        game_session = self.play_round(5)
+
+        response = self.client.post(f"/game-sessions/{game_session['id']}/score-round?mode=async")
+        self.assertEqual(response.status_code, 202)
+        job_id = response.get_json()['job_id']
+        jobs.wait(job_id, timeout=60)
+
+        response = self.client.get(response.get_json()['status_url'])
+        self.assertEqual(response.status_code, 200)
+        job = response.get_json()
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual((job['completed'], job['total'], job['progress']), (5, 5, 1.0))
+
+        # The bonus card awards 10 points for recycled materials
+        db.session.expire_all()
+        self.assertEqual([team.score for team in Team.query.all()], [10] * 5)
+        self.assertEqual([s.score for s in DesignSubmission.query.all()], [10] * 5)
+
+
+class LeaderboardTestCase(GameplayTestCase):
+
+    def test_leaderboards_follow_scored_rounds(self):
+        first = self.play_round(3)
+        second = self.play_round(2)
+        self.assertEqual(self.client.get('/leaderboards').get_json()['total'], 5)
+
+        self.client.post(f"/game-sessions/{first['id']}/score-round")
+        with self.capture_queries() as statements:
+            data = self.client.get('/leaderboards?limit=2').get_json()
+        self.assertEqual(statements, [])
+        self.assertEqual([(e['rank'], e['score']) for e in data['leaderboard']], [(1, 10), (1, 10)])
+        self.assertEqual(data['next_offset'], 2)
+
+        data = self.client.get(f"/leaderboards?game_session_id={second['id']}").get_json()
+        self.assertEqual([(e['rank'], e['score']) for e in data['leaderboard']], [(1, 0), (1, 0)])
+        self.assertIsNone(data['next_offset'])
+
+        team_id = second['teams'][0]['id']
+        data = self.client.get(f'/leaderboards/teams/{team_id}').get_json()
+        self.assertEqual((data['rank'], data['total']), (4, 5))
+        data = self.client.get(f'/leaderboards/teams/{team_id}?scope=session').get_json()
+        self.assertEqual((data['rank'], data['total']), (1, 2))
+        self.assertEqual(self.client.get('/leaderboards/teams/999').status_code, 404)
+
+    def test_leaderboard_reloads_count_scores_made_while_loading_once(self):
+        game_session = self.play_round(2)
+        self.client.post(f"/game-sessions/{game_session['id']}/score-round")
+        team_id = game_session['teams'][0]['id']
+        self.assertEqual(self.client.get(f'/leaderboards/teams/{team_id}').get_json()['score'], 10)
+        self.app.config['LEADERBOARD_TTL'] = 0
+
+        # While the reload reads the teams, another request commits 5
+        # points, which the reload's rows already include, and reads the
+        # leaderboard without waiting for the reload
+        served = []
+        def score_meanwhile(conn, cursor, statement, *args):
+            if statement.startswith('SELECT team.id') and not served:
+                served.append(leaderboards.rank_of(team_id)[1].score)
+                generation = leaderboards.begin_deltas()
+                conn.exec_driver_sql('UPDATE team SET score = score + 5 WHERE id = ?', (team_id,))
+                leaderboards.apply_deltas({team_id: 5}, generation)
+        event.listen(db.engine, 'before_cursor_execute', score_meanwhile)
+        try:
+            self.assertEqual(self.client.get(f'/leaderboards/teams/{team_id}').get_json()['score'], 15)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', score_meanwhile)
+        self.assertEqual(served, [10])
+        self.assertEqual(self.client.get(f'/leaderboards/teams/{team_id}').get_json()['score'], 15)
+
+
+class SubmitDesignTestCase(GameplayTestCase):
+
+    def test_duplicate_submission_conflicts(self):
+        game_session = self.play_round(2)
+        team_id = game_session['teams'][0]['id']
+        response = self.client.put(f"/game-sessions/{game_session['id']}/submit-design", json={
+            'team_id': team_id, 'design_data': 'Straw bale walls'
+        })
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(DesignSubmission.query.filter_by(team_id=team_id).one().design_data, 'Recycled timber frame')
+
+        # Rows that hit the unique constraint are skipped, not raised
+        round_id = DesignSubmission.query.first().round_id
+        inserted = insert_submissions([
+            {'team_id': team_id, 'round_id': round_id, 'design_data': 'Straw bale walls'},
+            {'team_id': team_id, 'round_id': round_id + 1, 'design_data': 'Straw bale walls'},
+        ])
+        self.assertEqual(list(inserted), [(team_id, round_id + 1)])
+
+    def test_batched_submissions_share_one_insert(self):
+        self.app.config['SUBMISSION_BATCHING'] = True
+        self.app.config['SUBMISSION_BATCH_WINDOW'] = 0.5
+        response = self.client.post('/game-sessions', json={
+            'name': 'League', 'number_of_rounds': 3, 'teams': [{'name': f'Team {i}'} for i in range(8)]
+        })
+        game_session = response.get_json()['game_session']
+        url = f"/game-sessions/{game_session['id']}"
+        self.client.post(f'{url}/start-round')
+
+        def submit(team_id):
+            return self.app.test_client().put(f'{url}/submit-design', json={
+                'team_id': team_id, 'design_data': 'Recycled timber frame'
+            })
+
+        team_ids = [team['id'] for team in game_session['teams']]
+        with self.capture_queries() as statements:
+            with ThreadPoolExecutor(max_workers=len(team_ids) + 1) as executor:
+                responses = list(executor.map(submit, team_ids + team_ids[:1]))
+        self.assertEqual(sorted(response.status_code for response in responses), [201] * 8 + [409])
+        self.assertEqual(len([s for s in statements if s.startswith('INSERT')]), 1)
+        submissions = [response.get_json()['submission'] for response in responses if response.status_code == 201]
+        self.assertEqual(sorted(submission['team_id'] for submission in submissions), team_ids)
+        self.assertEqual(len({submission['id'] for submission in submissions}), 8)
+
+        self.assertEqual(submit(team_ids[0]).status_code, 409)
+        self.assertEqual(submit(999).status_code, 404)
+        self.assertEqual(self.client.post(f'{url}/score-round').get_json()['results'][0]['score'], 10)
+
+    def test_a_bad_batched_submission_fails_alone(self):
+        self.app.config['SUBMISSION_BATCHING'] = True
+        self.app.config['SUBMISSION_BATCH_WINDOW'] = 0.5
+        game_session = self.client.post('/game-sessions', json={
+            'name': 'League', 'number_of_rounds': 3, 'teams': [{'name': f'Team {i}'} for i in range(4)]
+        }).get_json()['game_session']
+        self.client.post(f"/game-sessions/{game_session['id']}/start-round")
+        team_ids = [team['id'] for team in game_session['teams']]
+        round_id = Round.query.one().id
+        url = f"/game-sessions/{game_session['id']}/submit-design"
+        response = self.client.put(url, json={'team_id': team_ids[0], 'design_data': {'walls': 'straw'}})
+        self.assertEqual(response.status_code, 400)
+
+        # A row the database rejects fails its own request only
+        pending = [submission_batcher.submit(team_id, round_id, 'Recycled timber frame') for team_id in team_ids[:3]]
+        pending.append(submission_batcher.submit(team_ids[3], round_id, {'walls': 'straw'}))
+        self.assertEqual(len({future.result(timeout=60) for future in pending[:3]}), 3)
+        self.assertRaises(Exception, pending[3].result, timeout=60)
+        self.assertEqual(DesignSubmission.query.count(), 3)
+
+    def test_design_data_is_stored_compressed(self):
+        game_session = self.play_round(1)
+        response = self.client.get(f"/game-sessions/{game_session['id']}/round-results")
+        self.assertEqual(response.get_json()['results'][0]['design_data'], 'Recycled timber frame')
+
+        design = 'Recycled timber frame with straw bale insulation. ' * 200
+        submission = DesignSubmission.query.one()
+        submission.design_data = design
+        db.session.commit()
+        stored = db.session.execute(db.text('SELECT design_data FROM design_submission')).scalar_one()
+        self.assertIsInstance(stored, bytes)
+        self.assertLess(len(stored), len(design) // 10)
+        db.session.expire_all()
+        self.assertEqual(DesignSubmission.query.one().design_data, design)
+
+
+class RoundResultsTestCase(GameplayTestCase):
+
+    def test_summary_results_omit_design_data(self):
+        game_session = self.play_round(2)
+        url = f"/game-sessions/{game_session['id']}"
+
+        with self.capture_queries() as statements:
+            response = self.client.get(f'{url}/round-results?view=summary')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('design_data', statements[-1])
+        results = response.get_json()['results']
+        self.assertEqual([result['score'] for result in results], [None, None])
+        self.assertNotIn('design_data', results[0])
+
+        response = self.client.post(f'{url}/score-round?view=summary')
+        results = response.get_json()['results']
+        self.assertEqual([result['score'] for result in results], [10, 10])
+        self.assertNotIn('design_data', results[0])
+
+        design = self.client.get(results[0]['design_url']).get_json()
+        self.assertEqual((design['id'], design['team_id']), (results[0]['id'], results[0]['team_id']))
+        self.assertEqual((design['design_data'], design['score']), ('Recycled timber frame', 10))
+
+        other = self.play_round(1)
+        self.assertEqual(self.client.get(f"/game-sessions/{other['id']}/submissions/{design['id']}").status_code, 404)
+
+
+class HistoryExportTestCase(GameplayTestCase):
+
+    def test_export_history_streams_every_submission(self):
+        self.app.config['HISTORY_EXPORT_CHUNK_SIZE'] = 2
+        played = self.play_round(3)
+        self.client.post(f"/game-sessions/{played['id']}/score-round")
+        idle = self.client.post('/game-sessions', json={
+            'name': 'Idle', 'number_of_rounds': 1, 'teams': [{'name': 'Idle team'}]
+        }).get_json()['game_session']
+
+        response = self.client.get('/game-sessions/export', buffered=False)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        chunks = list(response.response)
+        self.assertEqual(len(chunks), 2)
+        rows = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+        self.assertEqual([row['game_session_id'] for row in rows], [played['id']] * 3 + [idle['id']])
+        self.assertEqual([row['score'] for row in rows[:3]], [10, 10, 10])
+        self.assertEqual(rows[0]['design_data'], 'Recycled timber frame')
+        self.assertIsNone(rows[3]['submission_id'])
+
+        response = self.client.get(f"/game-sessions/export?format=csv&game_session_id={played['id']}")
+        self.assertEqual(response.mimetype, 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        self.assertEqual(sorted(row['team_name'] for row in rows), ['Team 0', 'Team 1', 'Team 2'])
+        self.assertEqual(self.client.get('/game-sessions/export?format=xml').status_code, 400)
+
+        result = self.app.test_cli_runner().invoke(args=['export-history', '--game-session-id', str(idle['id'])])
+        self.assertEqual(json.loads(result.output)['game_session_name'], 'Idle')
+
+
+class SessionSnapshotTestCase(GameplayTestCase):
+
+    def test_snapshot_is_cached_until_the_session_changes(self):
+        game_session = self.play_round(3)
+        url = f"/game-sessions/{game_session['id']}"
+        team_ids = [team['id'] for team in game_session['teams']]
+        self.client.post('/game-sessions', json={'name': 'Other', 'number_of_rounds': 1, 'teams': [{'name': 'Other'}]})
+
+        snapshot = self.client.get(f'{url}/snapshot').get_json()
+        self.assertEqual([team['id'] for team in snapshot['teams']], team_ids)
+        self.assertEqual(snapshot['round_status']['submitted_team_ids'], team_ids)
+        self.assertEqual(snapshot['round_status']['pending_team_ids'], [])
+        self.assertEqual(snapshot['rounds'][0]['challenge_card']['title'], 'Cold Climate Home')
+        self.assertFalse(snapshot['rounds'][0]['scored'])
+
+        with self.capture_queries() as statements:
+            self.assertEqual(self.client.get(f'{url}/snapshot').get_json(), snapshot)
+        self.assertEqual(statements, [])
+
+        self.client.post(f'{url}/score-round')
+        snapshot = self.client.get(f'{url}/snapshot').get_json()
+        self.assertTrue(snapshot['rounds'][0]['scored'])
+        self.assertEqual([(entry['rank'], entry['score']) for entry in snapshot['standings']], [(1, 10)] * 3)
+
+        self.client.put(url, json={'teams': [{'id': team_ids[1], 'score': 25}]})
+        standings = self.client.get(f'{url}/snapshot').get_json()['standings']
+        self.assertEqual([(entry['rank'], entry['team_id']) for entry in standings],
+                         [(1, team_ids[1]), (2, team_ids[0]), (2, team_ids[2])])
+        self.assertEqual(self.client.get('/game-sessions/999/snapshot').status_code, 404)
+
+
+class SessionEventsTestCase(GameplayTestCase):
+
+    def test_events_stream_round_progress(self):
+        response = self.client.post('/game-sessions', json={
+            'name': 'League', 'number_of_rounds': 3, 'teams': [{'name': 'Team 0'}, {'name': 'Team 1'}]
+        })
+        game_session = response.get_json()['game_session']
+        stream = self.client.get(f"/game-sessions/{game_session['id']}/events", buffered=False)
+        self.assertEqual(stream.status_code, 200)
+        self.assertEqual(stream.mimetype, 'text/event-stream')
+        self.assertEqual(self.client.get('/game-sessions/999/events').status_code, 404)
+
+        response = self.client.post(f"/game-sessions/{game_session['id']}/start-round")
+        round_number = response.get_json()['round']['round_number']
+        for team in game_session['teams']:
+            self.client.put(f"/game-sessions/{game_session['id']}/submit-design", json={
+                'team_id': team['id'], 'design_data': 'Recycled timber frame'
+            })
+        self.client.post(f"/game-sessions/{game_session['id']}/score-round")
+
+        messages = (chunk.decode() for chunk in stream.response)
+        self.assertTrue(next(messages).startswith('retry: '))
+        events = []
+        for _ in range(4):
+            lines = next(messages).splitlines()
+            events.append((lines[0], json.loads(lines[1][len('data: '):])))
+        self.assertEqual([name for name, _ in events], [
+            'event: round-started', 'event: submission-received', 'event: submission-received', 'event: round-scored'
+        ])
+        self.assertEqual([data['round_number'] for _, data in events], [round_number] * 4)
+        self.assertEqual([data['team_id'] for _, data in events[1:3]], [team['id'] for team in game_session['teams']])
+        self.assertEqual([result['score'] for result in events[3][1]['results']], [10, 10])
+
+        stream.close()
+        self.assertEqual(self.app.extensions['session_events']['subscribers'], {})
+
+
+class GameSessionTestCase(AppTestCase):
+
+    def create_session(self, team_count, users_per_team=2):
+        response = self.client.post('/game-sessions', json={
+            'name': 'League', 'number_of_rounds': 3,
+            'teams': [{'name': f'Team {i}'} for i in range(team_count)]
+        })
+        game_session = response.get_json()['game_session']
+        for team in game_session['teams']:
+            db.session.add_all([
+                User(username=f"user{team['id']}-{i}", email=f"user{team['id']}-{i}@example.com", team_id=team['id'])
+                for i in range(users_per_team)
+            ])
+        db.session.commit()
+        return game_session
+
+    def count_queries(self, method, url, **kwargs):
+        with self.capture_queries() as statements:
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return len(statements)
+
+    def test_get_game_session_reports_teams_and_cards(self):
+        db.session.add_all([
+            ChallengeCard(title='Cold Climate Home', description='Insulate it.'),
+            BonusCard(name='Recycler', effect='Double points', scoring_rules='recycled:10'),
+        ])
+        db.session.commit()
+        game_session = self.create_session(2)
+        self.client.post(f"/game-sessions/{game_session['id']}/start-round")
+
+        data = self.client.get(f"/game-sessions/{game_session['id']}").get_json()
+        self.assertEqual([team['name'] for team in data['teams']], ['Team 0', 'Team 1'])
+        self.assertEqual([card['type'] for card in data['cards_in_play']], ['challenge', 'bonus'])
+
+    def test_session_and_team_reads_use_fixed_query_counts(self):
+        small = self.create_session(2)
+        large = self.create_session(25, users_per_team=4)
+
+        self.assertEqual(self.count_queries('get', '/teams'), 2)
+        self.assertEqual(
+            self.count_queries('get', f"/game-sessions/{small['id']}"),
+            self.count_queries('get', f"/game-sessions/{large['id']}")
+        )
+
+        counts = []
+        for game_session in (small, large):
+            payload = {'teams': [{'id': team['id'], 'score': 7} for team in game_session['teams']]}
+            counts.append(self.count_queries('put', f"/game-sessions/{game_session['id']}", json=payload))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual({team.score for team in Team.query.filter_by(game_session_id=large['id'])}, {7})
+
+    def test_session_updates_check_the_version(self):
+        game_session = self.create_session(2)
+        url = f"/game-sessions/{game_session['id']}"
+        version = self.client.get(url).get_json()['version']
+
+        response = self.client.put(url, json={'current_round': 2, 'version': version})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['game_session']['version'], version + 1)
+
+        response = self.client.put(url, json={'current_round': 3, 'version': version})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.get(url).get_json()['current_round'], 2)
+
+        # Score edits alone bump the version as well
+        team_id = game_session['teams'][0]['id']
+        response = self.client.put(url, json={'teams': [{'id': team_id, 'score': 40}], 'version': version + 1})
+        self.assertEqual(response.get_json()['game_session']['version'], version + 2)
+        response = self.client.put(url, json={'teams': [{'id': team_id, 'score': 50}], 'version': version + 1})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Team.query.get(team_id).score, 40)
+
+    def test_concurrent_start_round_conflicts(self):
+        db.session.add_all([
+            ChallengeCard(title='Cold Climate Home', description='Insulate it.'),
+            BonusCard(name='Recycler', effect='Double points', scoring_rules='recycled:10'),
+        ])
+        db.session.commit()
+        game_session = self.create_session(2)
+        url = f"/game-sessions/{game_session['id']}"
+
+        # Another worker advances the session between this request's read
+        # and its write
+        advanced = []
+        def advance_elsewhere(session, flush_context, instances):
+            if not advanced:
+                advanced.append(True)
+                session.connection().execute(
+                    db.text('UPDATE game_session SET version = version + 1, current_round = current_round + 1')
+                )
+        event.listen(db.session, 'before_flush', advance_elsewhere)
+        try:
+            response = self.client.post(f'{url}/start-round')
+        finally:
+            event.remove(db.session, 'before_flush', advance_elsewhere)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Round.query.count(), 0)
+        self.assertEqual(self.client.post(f'{url}/start-round').status_code, 201)
+        self.assertEqual(Round.query.count(), 1)
+
+
+class TeamRegistrationTestCase(AppTestCase):
+
+    def bulk_payload(self, count, prefix):
+        return {'teams': [{
+            'name': f'{prefix} {i}',
+            'users': [{'username': f'{prefix}-{i}-{j}', 'email': f'{prefix}-{i}-{j}@example.com'} for j in range(3)]
+        } for i in range(count)]}
+
+    def test_create_team_reuses_existing_users(self):
+        db.session.add(User(username='user1', email='user1@example.com'))
+        db.session.commit()
+        response = self.client.post('/teams', json={
+            'name': 'Team Alpha',
+            'users': [{'email': 'user1@example.com'}, {'username': 'user2', 'email': 'user2@example.com'}]
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(User.query.count(), 2)
+        self.assertEqual({user.team.name for user in User.query.all()}, {'Team Alpha'})
+
+        response = self.client.post('/teams', json={'name': 'Team Beta', 'users': [{'email': 'new@example.com'}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(User.query.count(), 2)
+
+    def test_create_teams_attach_users_to_the_inserted_team(self):
+        # A concurrent request inserts a team with the same name right after
+        # this request's INSERT; this request's users must not end up on it
+        inserted = []
+        def insert_elsewhere(conn, cursor, statement, *args):
+            if statement.startswith('INSERT INTO team') and not inserted:
+                inserted.append(True)
+                conn.exec_driver_sql("INSERT INTO team (name, score) VALUES ('Team Alpha', 0)")
+        event.listen(db.engine, 'after_cursor_execute', insert_elsewhere)
+        try:
+            created = create_teams([{'name': 'Team Alpha', 'users': [{'username': 'ada', 'email': 'ada@example.com'}]}])
+        finally:
+            event.remove(db.engine, 'after_cursor_execute', insert_elsewhere)
+        db.session.commit()
+        self.assertEqual(Team.query.filter_by(name='Team Alpha').count(), 2)
+        self.assertEqual(created[0]['id'], min(team.id for team in Team.query.all()))
+        self.assertEqual(User.query.filter_by(username='ada').one().team_id, created[0]['id'])
+
+    def test_bulk_team_registration(self):
+        response = self.client.post('/teams/bulk', json=self.bulk_payload(3, 'Small'))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([team['name'] for team in response.get_json()['teams']], ['Small 0', 'Small 1', 'Small 2'])
+        self.assertEqual(User.query.count(), 9)
+
+        with self.capture_queries() as small:
+            self.client.post('/teams/bulk', json=self.bulk_payload(3, 'Alpha'))
+        with self.capture_queries() as large:
+            response = self.client.post('/teams/bulk', json=self.bulk_payload(40, 'Beta'))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Team.query.count(), 46)
+
+    def test_bulk_team_registration_reports_every_error(self):
+        payload = self.bulk_payload(3, 'Gamma')
+        payload['teams'][1]['name'] = 'Small 0'
+        payload['teams'][2]['users'] = []
+        self.client.post('/teams/bulk', json=self.bulk_payload(1, 'Small'))
+
+        response = self.client.post('/teams/bulk', json=payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.get_json()['errors']], [1, 2])
+        self.assertEqual(Team.query.count(), 1)
+
+
+class MetricsTestCase(AppTestCase):
+
+    def test_metrics_report_latency_and_queries(self):
+        self.client.post('/teams', json={'name': 'Team Alpha', 'users': [{'username': 'user1', 'email': 'user1@example.com'}]})
+        self.client.get('/teams')
+        self.client.get('/teams')
+        self.client.get('/no-such-page')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain; version=0.0.4'))
+        text = response.get_data(as_text=True)
+        self.assertIn('http_request_duration_seconds_count{endpoint="main.get_all_teams",method="GET"} 2', text)
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="main.get_all_teams",method="GET",le="+Inf"} 2', text)
+        self.assertIn('http_requests_total{endpoint="main.get_all_teams",method="GET",status="200"} 2', text)
+        self.assertIn('http_requests_total{endpoint="unmatched",method="GET",status="404"} 1', text)
+        self.assertIn('db_queries_total{endpoint="main.get_all_teams",method="GET"} 4', text)
+        self.assertIn('db_query_duration_seconds_total{endpoint="main.create_team",method="POST"}', text)
+
+
 if __name__ == '__main__':
     unittest.main()
-
-def test_create_team(self):
-    response = self.client.post('/teams', json={
-        "name": "Team Alpha",
-        "users": [
-            {"username": "user1", "email": "user1@example.com"},
-            {"username": "user2", "email": "user2@example.com"}
-        ]
-    })
-    self.assertEqual(response.status_code, 201)
-    self.assertIn('Team created successfully!', str(response.data))
-
-    # Test for team name required
-    response = self.client.post('/teams', json={
-        "users": [
-            {"username": "user1", "email": "user1@example.com"},
-            {"username": "user2", "email": "user2@example.com"}
-        ]
-    })
-    self.assertEqual(response.status_code, 400)
-    self.assertIn('Team name is required', str(response.data))
-
-    # Test for user limit
-    response = self.client.post('/teams', json={
-        "name": "Team Beta",
-        "users": [
-            {"username": "user1", "email": "user1@example.com"},
-            {"username": "user2", "email": "user2@example.com"},
-            {"username": "user3", "email": "user3@example.com"},
-            {"username": "user4", "email": "user4@example.com"},
-            {"username": "user5", "email": "user5@example.com"},
-            {"username": "user6", "email": "user6@example.com"}
-        ]
-    })
-    self.assertEqual(response.status_code, 400)
-    self.assertIn('A team cannot have more than 5 users', str(response.data))
-
-def test_get_all_teams(self):
-    # Create a couple of teams for testing
-    team1 = Team(name='Team Alpha')
-    team2 = Team(name='Team Beta')
-    user1 = User(username='user1', email='user1@example.com', team=team1)
-    user2 = User(username='user2', email='user2@example.com', team=team1)
-    user3 = User(username='user3', email='user3@example.com', team=team2)
-    user4 = User(username='user4', email='user4@example.com', team=team2)
-
-    db.session.add_all([team1, team2, user1, user2, user3, user4])
-    db.session.commit()
-
-    response = self.client.get('/teams')
-    self.assertEqual(response.status_code, 200)
-    data = response.get_json()
-
-    # Verify the response data structure
-    self.assertEqual(len(data), 2)
-    self.assertEqual(data[0]['name'], 'Team Alpha')
-    self.assertEqual(len(data[0]['users']), 2)
-    self.assertEqual(data[1]['name'], 'Team Beta')
-    self.assertEqual(len(data[1]['users']), 2)
-
-def test_update_material_card(self):
-    # Create a material card for testing
-    material_card = MaterialCard(name='Concrete', properties='High strength', uses='Buildings')
-    db.session.add(material_card)
-    db.session.commit()
-
-    # Update the material card
-    response = self.client.put(f'/material-cards/{material_card.id}', json={
-        "name": "Updated Concrete",
-        "properties": "Improved compressive strength, better durability",
-        "uses": "Foundations, high-rise buildings"
-    })
-    self.assertEqual(response.status_code, 200)
-    self.assertIn('Material card updated successfully!', str(response.data))
-
-    # Verify the updated values
-    updated_material_card = MaterialCard.query.get(material_card.id)
-    self.assertEqual(updated_material_card.name, "Updated Concrete")
-    self.assertEqual(updated_material_card.properties, "Improved compressive strength, better durability")
-    self.assertEqual(updated_material_card.uses, "Foundations, high-rise buildings")
-
-
-def test_delete_material_card(self):
-    # Create a material card for testing
-    material_card = MaterialCard(name='Concrete', properties='High strength', uses='Buildings')
-    db.session.add(material_card)
-    db.session.commit()
-
-    # Delete the material card
-    response = self.client.delete(f'/material-cards/{material_card.id}')
-    self.assertEqual(response.status_code, 200)
-    self.assertIn(f'Material card with ID {material_card.id} deleted successfully!', str(response.data))
-
-    # Verify the material card has been deleted
-    deleted_material_card = MaterialCard.query.get(material_card.id)
-    self.assertIsNone(deleted_material_card)
-
-
-def test_get_challenge_cards(self):
-    # Add a couple of challenge cards for testing
-    card1 = ChallengeCard(
-        title="Design a Sustainable Home in a Cold Climate",
-        description="Create a design for a residential home that prioritizes energy efficiency and sustainability in a cold climate.",
-        key_considerations="Thermal insulation, renewable materials, energy-efficient windows, structural integrity under snow load.",
-        bonus_points=10
-    )
-    card2 = ChallengeCard(
-        title="Create a High-Rise Office Building with Maximum Transparency",
-        description="Design a modern office building that maximizes natural light and offers panoramic views of the city.",
-        key_considerations="Structural support for large glass facades, thermal efficiency, glare reduction, aesthetic appeal.",
-        bonus_points=15
-    )
-    
-    db.session.add_all([card1, card2])
-    db.session.commit()
-
-    # Send GET request
-    response = self.client.get('/challenge-cards')
-    self.assertEqual(response.status_code, 200)
-    data = response.get_json()
-
-    # Verify the response data structure
-    self.assertEqual(len(data), 2)
-    self.assertEqual(data[0]['title'], 'Design a Sustainable Home in a Cold Climate')
-    self.assertEqual(data[1]['title'], 'Create a High-Rise Office Building with Maximum Transparency')
-
-
-def test_create_challenge_card(self):
-    response = self.client.post('/challenge-cards', json={
-        "title": "Design a Pavilion for a Tropical Environment",
-        "description": "Create a pavilion that is well-suited for a hot and humid tropical climate, focusing on natural ventilation and protection from the elements.",
-        "key_considerations": "Weather-resistant materials, shading, cross-ventilation, lightweight construction.",
-        "bonus_points": 8
-    })
-    self.assertEqual(response.status_code, 201)
-    self.assertIn('Challenge card created successfully!', str(response.data))
-
-    # Verify the challenge card was added to the database
-    card = ChallengeCard.query.filter_by(title="Design a Pavilion for a Tropical Environment").first()
-    self.assertIsNotNone(card)
-    self.assertEqual(card.description, "Create a pavilion that is well-suited for a hot and humid tropical climate, focusing on natural ventilation and protection from the elements.")
-    self.assertEqual(card.key_considerations, "Weather-resistant materials, shading, cross-ventilation, lightweight construction.")
-    self.assertEqual(card.bonus_points, 8)
@@ -0,0 +1,61 @@
+import json
+import tracemalloc
+import unittest
+from app.scoring import ScoringContext, evaluate, parse_considerations, parse_scoring_rules
+
+class ScoringEngineTestCase(unittest.TestCase):
+
+    def test_parse_card_rules(self):
+        self.assertEqual(
+            parse_considerations('Thermal insulation, renewable materials.'),
+            ('thermal insulation', 'renewable materials')
+        )
+        self.assertEqual(
+            parse_scoring_rules('recycled:10, local materials: 5; flair'),
+            (('recycled', 10), ('local materials', 5))
+        )
+
+    def test_evaluate_scores_round_as_a_batch(self):
+        context = ScoringContext(
+            considerations=('thermal insulation', 'renewable materials'),
+            bonus_points=10,
+            bonus_rules=(('recycled', 5),)
+        )
+        designs = [
+            json.dumps({
+                'materials': ['timber', 'straw', 'timber'],
+                'notes': 'Thermal insulation from renewable materials, recycled glass.'
+            }),
+            'A concrete box with thermal insulation.',
+            json.dumps({'materials': []}),
+        ]
+        # materials 2 * 10, both considerations 30 + 10 bonus, recycled 5
+        # / one consideration 15 / nothing
+        self.assertEqual(evaluate(designs, context), [65, 15, 0])
+        self.assertEqual(evaluate(designs, context, ['materials']), [20, 0, 0])
+
+    def test_one_long_design_does_not_pad_the_others(self):
+        designs = ['Straw walls with thermal insulation.' * 5] * 999 + ['Recycled ' * 6000]
+        context = ScoringContext(('thermal insulation',), 0, (('recycled', 5),))
+        tracemalloc.start()
+        try:
+            scores = evaluate(designs, context)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(scores, [30] * 999 + [5])
+        self.assertLess(peak, 10 * 1024 * 1024)
+
+    def test_keywords_match_inside_words(self):
+        # "material" is found in "materials" and "recycle" in "recycled",
+        # in any order, but never across two words of the design
+        context = ScoringContext(('material reuse',), 0, (('recycle', 5), ('timber frame', 3)))
+        designs = ['Reused materials, recycled.', 'timber-frame', 'frame of timber', 'timbe rframe', '']
+        self.assertEqual(evaluate(designs, context, ['key_considerations', 'bonus_card']), [35, 3, 3, 0, 0])
+
+    def test_evaluate_empty_round(self):
+        self.assertEqual(evaluate([], ScoringContext((), 0, ())), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
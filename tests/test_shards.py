@@ -0,0 +1,117 @@
+import json
+import unittest
+from app import db
+from app.decks import decks
+from app.jobs import jobs
+from app.models import BonusCard, ChallengeCard, DesignSubmission, GameSession, Round, ScoringJob, Team, User
+from app.shards import shards
+from file_databases import FileDatabaseTestCase
+
+
+class ShardTestCase(FileDatabaseTestCase):
+    # The default database holds the catalog, next to two shards. SQLite
+    # can't interleave ids, so the sessions are seeded with ids that name
+    # their shard: 64 is on shard_0 and 1 on shard_1.
+
+    binds = ('shard_0', 'shard_1')
+
+    def settings(self):
+        return {'SHARD_BINDS': self.binds, 'SCORING_JOB_WORKERS': 0}
+
+    def setUp(self):
+        super().setUp()
+        db.session.add_all([
+            ChallengeCard(title='Cold Climate Home', description='Insulate it.', bonus_points=10),
+            BonusCard(name='Recycler', effect='Double points', scoring_rules='recycled:10'),
+        ])
+        db.session.commit()
+        for shard, id, name in (('shard_0', 64, 'Zero'), ('shard_1', 1, 'One')):
+            with shards.use(shard):
+                game_session = GameSession(id=id, name=name, number_of_rounds=3, teams=[Team(id=id, name=name)])
+                decks.deal(game_session)
+                db.session.add(game_session)
+                db.session.commit()
+
+    def count(self, model, bind=None):
+        with db.engines[bind].connect() as connection:
+            return connection.scalar(db.select(db.func.count()).select_from(model))
+
+
+class ShardRoutingTestCase(ShardTestCase):
+
+    def test_session_routes_use_the_sessions_shard(self):
+        self.assertEqual(self.client.get('/game-sessions/64').get_json()['name'], 'Zero')
+        self.assertEqual(self.client.get('/game-sessions/1').get_json()['name'], 'One')
+        self.assertEqual(self.client.get('/game-sessions/2').status_code, 404)
+
+        self.assertEqual(self.client.post('/game-sessions/1/start-round').status_code, 201)
+        response = self.client.put('/game-sessions/1/submit-design', json={'team_id': 1, 'design_data': 'Recycled timber'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.post('/game-sessions/1/score-round').status_code, 200)
+
+        self.assertEqual([self.count(Round, bind) for bind in (None, 'shard_0', 'shard_1')], [0, 0, 1])
+        self.assertEqual([self.count(DesignSubmission, bind) for bind in (None, 'shard_0', 'shard_1')], [0, 0, 1])
+        self.assertEqual([self.count(ChallengeCard, bind) for bind in (None, 'shard_0', 'shard_1')], [1, 0, 0])
+
+    def test_scoring_jobs_run_on_their_shard(self):
+        self.client.post('/game-sessions/1/start-round')
+        self.client.put('/game-sessions/1/submit-design', json={'team_id': 1, 'design_data': 'Recycled timber'})
+        response = self.client.post('/game-sessions/1/score-round?mode=async')
+        self.assertEqual(response.status_code, 202)
+        jobs.wait(response.get_json()['job_id'], timeout=60)
+
+        job = self.client.get(response.get_json()['status_url']).get_json()
+        self.assertEqual((job['game_session_id'], job['status']), (1, 'completed'))
+        self.assertEqual([self.count(ScoringJob, bind) for bind in (None, 'shard_0', 'shard_1')], [0, 0, 1])
+        # Finished jobs drop their futures, however quickly they ran
+        jobs.shutdown(self.app)
+        self.assertEqual(self.app.extensions['scoring_jobs']['futures'], {})
+
+    def test_new_sessions_take_turns_across_shards(self):
+        created = []
+        for _ in range(2):
+            response = self.client.post('/game-sessions', json={
+                'name': 'League', 'number_of_rounds': 3, 'teams': [{'name': 'Team'}]
+            })
+            self.assertEqual(response.status_code, 201)
+            created.append(response.get_json()['game_session'])
+        self.assertEqual([self.count(GameSession, bind) for bind in (None, 'shard_0', 'shard_1')], [0, 2, 2])
+
+        self.assertEqual(sorted(game_session['id'] % 64 for game_session in created), [0, 1])
+        for game_session in created:
+            response = self.client.get(f"/game-sessions/{game_session['id']}")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()['teams'], game_session['teams'])
+            self.assertEqual(self.client.post(f"/game-sessions/{game_session['id']}/start-round").status_code, 201)
+
+    def test_reads_and_team_names_span_every_shard(self):
+        self.assertEqual([team['id'] for team in self.client.get('/teams').get_json()], [1, 64])
+        self.assertEqual(self.client.get('/leaderboards').get_json()['total'], 2)
+        lines = self.client.get('/game-sessions/export').get_data(as_text=True).splitlines()
+        self.assertEqual(sorted(json.loads(line)['game_session_id'] for line in lines), [1, 64])
+
+        team = {'name': 'One', 'game_session_id': 64, 'users': [{'username': 'ada', 'email': 'ada@example.com'}]}
+        self.assertEqual(self.client.post('/teams', json=team).status_code, 400)
+        team['name'] = 'Two'
+        self.assertEqual(self.client.post('/teams', json={**team, 'game_session_id': 2}).status_code, 404)
+        self.assertEqual(self.client.post('/teams', json=team).status_code, 201)
+        self.assertEqual([self.count(Team, bind) for bind in (None, 'shard_0', 'shard_1')], [0, 2, 1])
+
+
+    def test_users_stay_unique_across_shards(self):
+        ada = {'username': 'ada', 'email': 'ada@example.com'}
+        for name, game_session_id in (('Two', 64), ('Three', 1)):
+            response = self.client.post('/teams', json={'name': name, 'game_session_id': game_session_id, 'users': [ada]})
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual([self.count(User, bind) for bind in (None, 'shard_0', 'shard_1')], [0, 0, 1])
+        with shards.use('shard_1'):
+            self.assertEqual(User.query.one().team.name, 'Three')
+
+        impostor = {'username': 'ada', 'email': 'other@example.com'}
+        response = self.client.post('/teams', json={'name': 'Four', 'game_session_id': 64, 'users': [impostor]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.count(User, 'shard_0'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()